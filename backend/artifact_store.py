@@ -0,0 +1,235 @@
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+
+load_dotenv()
+
+# Byte budget shared by audio/ and videos/ (0 disables the quota)
+ARTIFACT_QUOTA_BYTES = int(os.getenv("ARTIFACT_QUOTA_BYTES", str(2 * 1024 ** 3)))
+# Artifacts not accessed for this many seconds are removed regardless of quota (0 disables)
+ARTIFACT_MAX_AGE = float(os.getenv("ARTIFACT_MAX_AGE", str(7 * 24 * 3600)))
+# Files modified more recently than this are never evicted (covers in-progress writes)
+ARTIFACT_MIN_AGE = float(os.getenv("ARTIFACT_MIN_AGE", "600"))
+# Leftovers in temp directories older than this are treated as orphans
+TEMP_MAX_AGE = float(os.getenv("TEMP_MAX_AGE", "3600"))
+ARTIFACT_SWEEP_INTERVAL = float(os.getenv("ARTIFACT_SWEEP_INTERVAL", "300"))
+
+
+class ArtifactStore:
+    """Keeps generated artifact directories under a byte quota.
+
+    Tracks size and last access of every file, evicts least recently used
+    files once the quota is exceeded (or once they pass max_age), and removes
+    orphaned leftovers from temp directories. Files that are pinned (being
+    streamed) or were modified within min_age seconds are never touched.
+    """
+
+    def __init__(self, directories, quota_bytes: int = ARTIFACT_QUOTA_BYTES, max_age: float = ARTIFACT_MAX_AGE,
+                 min_age: float = ARTIFACT_MIN_AGE, temp_directories=(), temp_max_age: float = TEMP_MAX_AGE,
+                 on_evict=None):
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.temp_directories = [os.path.abspath(d) for d in temp_directories]
+        self.quota_bytes = quota_bytes
+        self.max_age = max_age
+        self.min_age = min_age
+        self.temp_max_age = temp_max_age
+        self.on_evict = on_evict
+        self._last_access = {}  # path -> wall-clock time of last read
+        self._pins = {}  # path -> number of active readers
+        self._lock = threading.Lock()
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.orphans_removed = 0
+        self.last_sweep = None
+
+    def touch(self, path: str):
+        with self._lock:
+            self._last_access[os.path.abspath(path)] = time.time()
+
+    @contextmanager
+    def pin(self, path: str):
+        """Protect path from eviction while it is being read, and record the access."""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+            self._last_access[path] = time.time()
+        try:
+            yield
+        finally:
+            self.unpin(path)
+
+    def hold(self, path: str) -> str:
+        """Pin without a context manager; release later with unpin() (e.g. from a background task)."""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+            self._last_access[path] = time.time()
+        return path
+
+    def unpin(self, path: str):
+        path = os.path.abspath(path)
+        with self._lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+
+    def _entries(self):
+        """List (path, size, last_access, mtime) for every file in the managed directories."""
+        with self._lock:
+            last_accesses = dict(self._last_access)
+        entries = []
+        for directory in self.directories:
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                last_access = last_accesses.get(entry.path, stat.st_mtime)
+                entries.append((entry.path, stat.st_size, max(last_access, stat.st_mtime), stat.st_mtime))
+        return entries
+
+    def _evictable(self, path: str, mtime: float, now: float) -> bool:
+        return self._pins.get(path, 0) == 0 and now - mtime >= self.min_age
+
+    def _remove(self, path: str, size: int) -> bool:
+        with self._lock:
+            # A reader may have pinned it since the candidates were picked
+            if self._pins.get(path, 0):
+                return False
+            try:
+                os.remove(path)
+            except OSError:
+                return False
+            self._last_access.pop(path, None)
+        self.evicted_files += 1
+        self.evicted_bytes += size
+        print(f"🧹 Evicted {os.path.basename(path)} ({size / 1024 / 1024:.1f} MB)")
+        if self.on_evict:
+            self.on_evict(path)
+        return True
+
+    def sweep(self) -> dict:
+        """Apply age and quota eviction and remove temp orphans. Returns what was removed."""
+        now = time.time()
+        entries = self._entries()
+        with self._lock:
+            candidates = [e for e in entries if self._evictable(e[0], e[3], now)]
+        # Least recently used first
+        candidates.sort(key=lambda e: e[2])
+
+        total = sum(size for _, size, _, _ in entries)
+        removed = []
+        remaining = []
+        for path, size, last_access, _ in candidates:
+            if self.max_age > 0 and now - last_access > self.max_age and self._remove(path, size):
+                removed.append(path)
+                total -= size
+            else:
+                remaining.append((path, size))
+
+        if self.quota_bytes > 0:
+            for path, size in remaining:
+                if total <= self.quota_bytes:
+                    break
+                if self._remove(path, size):
+                    removed.append(path)
+                    total -= size
+
+        removed.extend(self.sweep_temp(now))
+        self.last_sweep = now
+        return {"removed": len(removed), "bytes_after": total}
+
+    def sweep_temp(self, now: float = None) -> list:
+        """Remove files and job directories in the temp directories that nobody has touched for temp_max_age."""
+        now = now or time.time()
+        removed = []
+        for directory in self.temp_directories:
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                try:
+                    age = now - entry.stat(follow_symlinks=False).st_mtime
+                except FileNotFoundError:
+                    continue
+                with self._lock:
+                    pinned = self._pins.get(entry.path, 0)
+                if age < self.temp_max_age or pinned:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        continue
+                self.orphans_removed += 1
+                removed.append(entry.path)
+        return removed
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            pinned = sum(1 for count in self._pins.values() if count)
+        directories = {}
+        for path, size, _, _ in entries:
+            d = directories.setdefault(os.path.basename(os.path.dirname(path)), {"files": 0, "bytes": 0})
+            d["files"] += 1
+            d["bytes"] += size
+        total = sum(d["bytes"] for d in directories.values())
+        return {
+            "directories": directories,
+            "total_bytes": total,
+            "quota_bytes": self.quota_bytes,
+            "quota_used": round(total / self.quota_bytes, 4) if self.quota_bytes else None,
+            "max_age_seconds": self.max_age,
+            "pinned": pinned,
+            "evicted_files": self.evicted_files,
+            "evicted_bytes": self.evicted_bytes,
+            "orphans_removed": self.orphans_removed,
+            "last_sweep": self.last_sweep,
+        }
+
+
+class TrackedStaticFiles(StaticFiles):
+    """StaticFiles that records access and pins the file in the store while it is being sent."""
+
+    def __init__(self, *args, store: ArtifactStore, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await super().__call__(scope, receive, send)
+        path = os.path.join(self.directory, self.get_path(scope))
+        with self.store.pin(path):
+            await super().__call__(scope, receive, send)
+
+
+class PinnedFileResponse(FileResponse):
+    """FileResponse that keeps its file pinned in the store until it has been sent."""
+
+    def __init__(self, path, *args, store: ArtifactStore, **kwargs):
+        super().__init__(path, *args, **kwargs)
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        with self.store.pin(self.path):
+            await super().__call__(scope, receive, send)
+
+
+async def pinned_chunks(store: ArtifactStore, path: str, chunks):
+    """Wrap an async byte stream so path stays pinned for as long as it is being streamed."""
+    with store.pin(path):
+        async for data in chunks:
+            yield data
@@ -1,116 +1,544 @@
 import asyncio
-import json
 import os
 import base64
-import websockets
+import queue
+import shutil
+import struct
+import threading
+import time
+from tts_pool import get_pool
+from tts_cache import tts_cache
+from scheduler import api_scheduler
+from metrics import span
 from script_gen import generate_script
 from dotenv import load_dotenv
 
 load_dotenv()
 
 XAI_API_KEY = os.getenv("XAI_API_KEY")
-base_url = "wss://api.x.ai/v1/realtime"
+
+# PCM format produced by the realtime API and written to the wav files
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2  # 16-bit
+CHANNELS = 1
+FRAME_BYTES = SAMPLE_WIDTH * CHANNELS
+WAV_HEADER_BYTES = 44
+# Data size advertised while a file is still being written (players read until the stream ends)
+STREAMING_DATA_SIZE = 0xFFFFFFFF - 36
+# A wav written by another process (a worker) is polled this often for new PCM; one that has
+# not grown for WAV_FOLLOW_IDLE_TIMEOUT seconds is treated as abandoned by its writer
+WAV_FOLLOW_POLL_INTERVAL = float(os.getenv("WAV_FOLLOW_POLL_INTERVAL", "0.25"))
+WAV_FOLLOW_IDLE_TIMEOUT = float(os.getenv("WAV_FOLLOW_IDLE_TIMEOUT", "120"))
+
+# "segments" synthesizes each script segment concurrently, "joined" sends the whole script in one request
+TTS_MODE = os.getenv("TTS_MODE", "segments")
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
+TTS_SEGMENT_PADDING_MS = int(os.getenv("TTS_SEGMENT_PADDING_MS", "250"))
+
+# Output codec for finished podcasts; anything but wav is encoded with a local ffmpeg
+AUDIO_CODEC = os.getenv("AUDIO_CODEC", "mp3")
+AUDIO_CODECS = {
+    "wav": {"ext": "wav", "media_type": "audio/wav", "ffmpeg": ["-c:a", "pcm_s16le", "-f", "wav"]},
+    "mp3": {"ext": "mp3", "media_type": "audio/mpeg",
+            "ffmpeg": ["-c:a", "libmp3lame", "-b:a", os.getenv("AUDIO_MP3_BITRATE", "48k"), "-f", "mp3"]},
+    "opus": {"ext": "ogg", "media_type": "audio/ogg",
+             "ffmpeg": ["-c:a", "libopus", "-b:a", os.getenv("AUDIO_OPUS_BITRATE", "32k"), "-f", "ogg"]},
+}
 
 # Create audio directory if it doesn't exist
 if not os.path.exists("audio"):
     os.makedirs("audio")
 
-async def text_to_speech(text: str, voice: str = "Ara"):
-    """Convert text to speech using Grok Voice API"""
-    
-    audio_chunks = []
+def wav_header(data_bytes: int) -> bytes:
+    """Canonical 44-byte PCM wav header, identical to what the wave module writes."""
+    byte_rate = SAMPLE_RATE * FRAME_BYTES
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, CHANNELS, SAMPLE_RATE, byte_rate, FRAME_BYTES, SAMPLE_WIDTH * 8,
+        b"data", data_bytes,
+    )
+
+
+class StreamingWavWriter:
+    """Appends PCM to a wav file as it arrives and patches the header sizes on close.
+
+    write() only queues the PCM: a writer thread puts it on disk, so callers on
+    the event loop never wait for the file. data_bytes counts what is on disk.
+    Readers can follow a file that is still being written with wait_for(), which
+    is woken by the writer rather than by polling the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.data_bytes = 0
+        self.closed = False
+        self._carry = b""  # trailing half-sample from the last delta
+        self._lock = threading.Lock()
+        self._waiters = set()  # (loop, asyncio.Event) of readers waiting for more data
+        self._file = open(path, "wb")
+        self._file.write(wav_header(0))
+        self._file.flush()
+        self._pending = queue.Queue()  # PCM waiting for the writer thread; None stops it
+        self._error = None
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._write_pending, name="wav-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, pcm: bytes):
+        """Queue PCM for the file. pcm must not be modified afterwards."""
+        if self._carry:
+            pcm = self._carry + pcm
+        usable = len(pcm) - len(pcm) % FRAME_BYTES
+        self._carry = pcm[usable:]
+        if usable:
+            self._pending.put(pcm if usable == len(pcm) else pcm[:usable])
+
+    def _write_pending(self):
+        while True:
+            pcm = self._pending.get()
+            if pcm is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._file.write(pcm)
+                self._file.flush()
+            except OSError as e:
+                self._error = e
+                continue
+            self.data_bytes += len(pcm)
+            self._notify()
+
+    def drop_partial_sample(self):
+        """Discard a dangling half-sample so the next segment starts sample-aligned."""
+        self._carry = b""
+
+    def close(self):
+        """Write out the queued PCM and patch the header; blocks until the writer thread is done."""
+        with self._close_lock:
+            if self.closed:
+                return
+            self._pending.put(None)
+            self._thread.join()
+            try:
+                self._file.seek(0)
+                self._file.write(wav_header(self.data_bytes))
+                self._file.close()
+            finally:
+                self.closed = True
+                active_writers.pop(self.filename, None)
+                self._notify()
+        if self._error is not None:
+            raise self._error
+
+    def _notify(self):
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, wakeup in waiters:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass
+
+    async def wait_for(self, offset: int):
+        """Wait until more than offset data bytes are on disk or the writer is closed."""
+        wakeup = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), wakeup)
+        with self._lock:
+            if self.data_bytes > offset or self.closed:
+                return
+            self._waiters.add(waiter)
+        try:
+            await wakeup.wait()
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+# Podcasts currently being written, by filename
+active_writers = {}
+
+
+def open_writer(filename: str) -> StreamingWavWriter:
+    if not os.path.exists("audio"):
+        os.makedirs("audio")
+    writer = StreamingWavWriter(os.path.join("audio", filename))
+    active_writers[filename] = writer
+    return writer
+
+
+async def follow_wav(writer: StreamingWavWriter, chunk_size: int = 64 * 1024):
+    """Yield a wav that is still being written: a streaming header, then PCM as it lands on disk."""
+    yield wav_header(STREAMING_DATA_SIZE)
+    offset = 0
+    with open(writer.path, "rb") as f:
+        f.seek(WAV_HEADER_BYTES)
+        while True:
+            available = writer.data_bytes - offset
+            if available > 0:
+                data = f.read(min(available, chunk_size))
+                offset += len(data)
+                yield data
+            elif writer.closed:
+                return
+            else:
+                await writer.wait_for(offset)
+
+
+def wav_in_progress(path: str) -> bool:
+    """Whether a wav is still being written, possibly by another process.
+
+    StreamingWavWriter leaves the header's data size at 0 until it closes the
+    file; a file that also stopped growing long ago was abandoned by its writer.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(WAV_HEADER_BYTES)
+        modified = os.path.getmtime(path)
+    except OSError:
+        return False
+    if len(header) < WAV_HEADER_BYTES or struct.unpack_from("<I", header, 40)[0] != 0:
+        return False
+    return time.time() - modified < WAV_FOLLOW_IDLE_TIMEOUT
+
+
+async def follow_wav_file(path: str, chunk_size: int = 64 * 1024, poll_interval: float = WAV_FOLLOW_POLL_INTERVAL,
+                          idle_timeout: float = WAV_FOLLOW_IDLE_TIMEOUT):
+    """Like follow_wav for a wav whose writer runs in another process, by polling the file.
+
+    Ends once the writer has patched the final data size into the header and
+    all of it was sent, or when the file is deleted or stops growing for
+    idle_timeout seconds.
+    """
+    yield wav_header(STREAMING_DATA_SIZE)
+    offset = 0
+    idle_since = time.monotonic()
+    with open(path, "rb") as f:
+        while True:
+            f.seek(40)
+            final_size = struct.unpack("<I", f.read(4))[0]
+            f.seek(WAV_HEADER_BYTES + offset)
+            data = f.read(min(chunk_size, final_size - offset) if final_size else chunk_size)
+            if data:
+                offset += len(data)
+                idle_since = time.monotonic()
+                yield data
+            elif final_size or not os.path.exists(path) or time.monotonic() - idle_since > idle_timeout:
+                return
+            else:
+                await asyncio.sleep(poll_interval)
+
+
+async def stream_speech(text: str, voice: str, on_audio) -> bool:
+    """Synthesize text on a pooled realtime session, passing decoded PCM to on_audio as it arrives.
+
+    Returns True if the response completed without a server error.
+    """
+
+    def on_delta(delta):
+        # Decode each base64 chunk straight away instead of holding the whole stream as text
+        on_audio(base64.b64decode(delta))
+        print(".", end="", flush=True)
+
+    async with api_scheduler.aslot("tts"):
+        with span("tts", chars=len(text)) as call:
+            complete = await get_pool().speak(text, voice, on_delta)
+            call["complete"] = complete
+    print("\nAudio generation complete!")
+    return complete
+
+
+async def text_to_speech(text: str, voice: str = "Ara", on_audio=None):
+    """Convert text to speech using Grok Voice API
+
+    Each audio delta is decoded as it arrives. If on_audio is given it receives
+    the PCM bytes incrementally and an empty result is returned; otherwise the
+    decoded PCM is accumulated and returned. The realtime connection comes from
+    a pool of warm, pre-configured sessions (see tts_pool).
+    """
     
-    async with websockets.connect(
-        uri=base_url,
-        ssl=True,
-        additional_headers={"Authorization": f"Bearer {XAI_API_KEY}"}
-    ) as ws:
-        
-        # Configure session with desired voice
-        session_config = {
-            "type": "session.update",
-            "session": {
-                "voice": voice,  # Options: Ara, Rex, Sal, Eve, Leo
-                "instructions": "You are a text-to-speech assistant. Read the text exactly as provided.",
-                "turn_detection": {"type": "server_vad"},
-                "audio": {
-                    "input": {"format": {"type": "audio/pcm", "rate": 24000}},
-                    "output": {"format": {"type": "audio/pcm", "rate": 24000}}
-                }
-            }
-        }
-        await ws.send(json.dumps(session_config))
-        
-        # Send the text to convert
-        text_message = {
-            "type": "conversation.item.create",
-            "item": {
-                "type": "message",
-                "role": "user",
-                "content": [{"type": "input_text", "text": text}]
-            }
-        }
-        await ws.send(json.dumps(text_message))
-        
-        # Request response
-        response_request = {
-            "type": "response.create",
-            "response": {
-                "modalities": ["audio"]  # Only audio, no text needed
-            }
-        }
-        await ws.send(json.dumps(response_request))
-        
-        # Collect audio chunks
-        response_done = False
-        while not response_done:
-            message = await ws.recv()
-            event = json.loads(message)
-            
-            if event["type"] == "response.output_audio.delta":
-                # Collect base64 audio chunks
-                audio_chunks.append(event["delta"])
-                print(".", end="", flush=True)
-            
-            elif event["type"] == "response.output_audio.done":
-                response_done = True
-                print("\nAudio generation complete!")
-            
-            elif event["type"] == "error":
-                print(f"Error: {event}")
+    audio = bytearray()
+    await stream_speech(text, voice, on_audio or audio.extend)
+    return bytes(audio)
+
+
+async def speak_and_cache(text: str, voice: str, on_audio):
+    """Synthesize text and store the PCM in the segment cache if the response completed."""
+    pcm = bytearray()
+
+    def tee(chunk):
+        pcm.extend(chunk)
+        on_audio(chunk)
+
+    if await stream_speech(text, voice, tee):
+        # Cache writes (and any quota sweep) touch the disk; keep them off the event loop
+        await asyncio.to_thread(tts_cache.put, text, voice, SAMPLE_RATE, bytes(pcm))
+
+
+async def speak_cached(text: str, voice: str, on_audio):
+    """Like speak_and_cache, but served straight from the segment cache when the narration was seen before."""
+    cached = await asyncio.to_thread(tts_cache.get, text, voice, SAMPLE_RATE)
+    if cached is not None:
+        on_audio(cached)
+        return
+    await speak_and_cache(text, voice, on_audio)
+
+def silence(duration_ms: int) -> bytes:
+    """Return duration_ms of 16-bit mono silence at SAMPLE_RATE."""
+    frames = SAMPLE_RATE * max(0, duration_ms) // 1000
+    return b"\x00" * (frames * SAMPLE_WIDTH * CHANNELS)
+
+
+class OrderedSegmentWriter:
+    """Writes concurrently synthesized segments to a wav writer in script order.
+
+    The earliest unfinished segment streams straight to disk; later segments
+    are buffered in memory until every segment before them has finished.
+    Segments can keep being added (add()) while earlier ones are written.
+    """
+
+    def __init__(self, writer: StreamingWavWriter, count: int, padding_ms: int):
+        self.writer = writer
+        self.padding = silence(padding_ms)
+        self.buffers = []
+        self.finished = []
+        self.head = 0
+        for _ in range(count):
+            self.add()
+
+    def add(self) -> int:
+        """Append a segment after the known ones and return its index."""
+        index = len(self.finished)
+        self.buffers.append(bytearray())
+        self.finished.append(False)
+        if index and index == self.head:
+            # Every earlier segment is already on disk; this one follows straight on
+            self.writer.write(self.padding)
+        return index
+
+    def write(self, index: int, pcm: bytes):
+        if index == self.head:
+            self.writer.write(pcm)
+        else:
+            self.buffers[index].extend(pcm)
+
+    def finish(self, index: int):
+        self.finished[index] = True
+        while self.head < len(self.finished) and self.finished[self.head]:
+            self.writer.drop_partial_sample()
+            self.head += 1
+            if self.head < len(self.finished):
+                self.writer.write(self.padding)
+                # Hand the buffer itself to the writer; the segment gets a fresh one
+                buffered = self.buffers[self.head]
+                self.buffers[self.head] = bytearray()
+                self.writer.write(buffered)
+
+
+async def iterate(items):
+    """Iterate a list or an async iterator (e.g. a streamed script) the same way."""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def synthesize_segments(texts, writer: StreamingWavWriter, voice: str = "Ara",
+                              max_concurrency: int = TTS_CONCURRENCY, padding_ms: int = TTS_SEGMENT_PADDING_MS):
+    """Synthesize each text concurrently (at most max_concurrency at a time) and write the PCM in order.
+
+    texts may be an async iterator; each text starts synthesizing as soon as it arrives.
+    Segments already in the TTS cache are written straight away; only misses are synthesized.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    ordered = OrderedSegmentWriter(writer, 0, padding_ms)
+
+    async def synthesize(index, text):
+        cached = await asyncio.to_thread(tts_cache.get, text, voice, SAMPLE_RATE)
+        if cached is not None:
+            ordered.write(index, cached)
+        else:
+            async with semaphore:
+                await speak_and_cache(text, voice, lambda pcm: ordered.write(index, pcm))
+        ordered.finish(index)
+
+    tasks = []
+    try:
+        async for text in iterate(texts):
+            tasks.append(asyncio.create_task(synthesize(ordered.add(), text)))
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def negotiate_codec(requested: str = None, accept: str = None):
+    """Codec explicitly asked for by name or via the Accept header, or None if nothing supported was asked for."""
+    codec = (requested or "").lower()
+    if codec in AUDIO_CODECS:
+        return codec
+    for part in (accept or "").split(","):
+        media_type = part.split(";")[0].strip().lower()
+        for name, c in AUDIO_CODECS.items():
+            if c["media_type"] == media_type:
+                return name
+    return None
+
+
+def can_encode(codec: str) -> bool:
+    return codec == "wav" or shutil.which("ffmpeg") is not None
+
+
+def resolve_codec(requested: str = None, accept: str = None) -> str:
+    """Pick the output codec: explicit request, then Accept header, then AUDIO_CODEC.
+
+    Falls back to wav when ffmpeg isn't available to encode anything else.
+    """
+    codec = negotiate_codec(requested, accept) or AUDIO_CODEC
+    if codec not in AUDIO_CODECS or not can_encode(codec):
+        codec = "wav"
+    return codec
+
+
+async def transcode_file(source_path: str, output_path: str, codec: str):
+    """Encode a finished wav into codec with ffmpeg, without blocking the event loop."""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-y", "-loglevel", "error", "-i", source_path, *AUDIO_CODECS[codec]["ffmpeg"], output_path,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to encode {codec}: {stderr.decode(errors='replace')}")
+
+
+async def read_file_chunks(path: str, chunk_size: int = 64 * 1024):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+
+async def transcode_stream(chunks, codec: str, chunk_size: int = 16 * 1024):
+    """Transcode an async stream of audio bytes into codec on the fly by piping it through ffmpeg."""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-loglevel", "error", "-i", "pipe:0", *AUDIO_CODECS[codec]["ffmpeg"], "pipe:1",
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+
+    async def feed():
+        try:
+            async for data in chunks:
+                process.stdin.write(data)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            process.stdin.close()
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while True:
+            data = await process.stdout.read(chunk_size)
+            if not data:
                 break
-    
-    # Combine all audio chunks
-    full_audio_base64 = "".join(audio_chunks)
-    audio_bytes = base64.b64decode(full_audio_base64)
-    
-    return audio_bytes
+            yield data
+        await feeder
+    finally:
+        if process.returncode is None:
+            feeder.cancel()
+            process.kill()
+        await process.wait()
+
+
+def find_finished_audio(filename: str):
+    """Locate the finished file for a podcast stream name, whatever codec it was encoded to."""
+    stem = os.path.splitext(filename)[0]
+    # Prefer the encoded file over a leftover wav
+    for name, codec in sorted(AUDIO_CODECS.items(), key=lambda item: item[0] == "wav"):
+        path = os.path.join("audio", f"{stem}.{codec['ext']}")
+        if os.path.isfile(path):
+            return path, name
+    return None, None
+
 
 # Usage
-async def generate_audio(script: list, output_filename: str = "output.wav") -> str:
+async def generate_audio(script, output_filename: str = "output.wav", mode: str = TTS_MODE,
+                         max_concurrency: int = TTS_CONCURRENCY, padding_ms: int = TTS_SEGMENT_PADDING_MS,
+                         on_stream_start=None, codec: str = None) -> str:
     """
     Generates audio from the script and saves it to the specified filename in the audio/ directory.
     Returns the relative path to the audio file.
+
+    In "segments" mode each segment's narration is synthesized concurrently and the
+    results are concatenated in script order with padding_ms of silence in between,
+    so latency follows the longest segment rather than the whole script.
+
+    script may be an async iterator of segments (a streamed script): synthesis of
+    each segment starts as soon as it arrives.
+
+    PCM is appended to the wav as it arrives. on_stream_start, if given, is called
+    with the progressive stream path as soon as the file is open for reading.
+
+    The finished podcast is encoded to codec (default AUDIO_CODEC) and the
+    extension of the returned path follows it, e.g. podcast_x.mp3.
     """
-    full_script = ""
-    for item in script:
-        full_script += item["narration"] + " "
-        
-    audio_data = await text_to_speech(full_script, voice="Ara")
-    
-    # Ensure audio directory exists
-    if not os.path.exists("audio"):
-        os.makedirs("audio")
-        
-    file_path = os.path.join("audio", output_filename)
-    
-    # Save to file
-    import wave
-    with wave.open(file_path, "wb") as wav:
-        wav.setnchannels(1)  # Mono
-        wav.setsampwidth(2)  # 16-bit
-        wav.setframerate(24000)  # 24kHz
-        wav.writeframes(audio_data)
-    
-    print(f"Audio saved to {file_path}")
-    return f"/audio/{output_filename}"
\ No newline at end of file
+    narrations = (item["narration"] async for item in iterate(script) if item.get("narration", "").strip())
+    requested_codec = codec or AUDIO_CODEC
+    codec = resolve_codec(codec)
+    if codec != requested_codec:
+        print(f"⚠️  Cannot encode {requested_codec} (is ffmpeg installed?), writing {codec}")
+    stem = os.path.splitext(output_filename)[0]
+    wav_filename = f"{stem}.wav"
+
+    writer = open_writer(wav_filename)
+    try:
+        if on_stream_start:
+            on_stream_start(f"/stream/audio/{wav_filename}")
+
+        if mode == "segments":
+            await synthesize_segments(narrations, writer, voice="Ara", max_concurrency=max_concurrency,
+                                      padding_ms=padding_ms)
+        else:
+            full_script = ""
+            async for narration in narrations:
+                full_script += narration + " "
+            await speak_cached(full_script, "Ara", writer.write)
+        # Waits for the writer thread to put the last queued PCM on disk
+        await asyncio.to_thread(writer.close)
+    except BaseException:
+        writer.close()
+        os.remove(writer.path)
+        raise
+
+    if codec == "wav":
+        print(f"Audio saved to {writer.path}")
+        return f"/audio/{wav_filename}"
+
+    encoded_filename = f"{stem}.{AUDIO_CODECS[codec]['ext']}"
+    encoded_path = os.path.join("audio", encoded_filename)
+    try:
+        # Encode under a temporary name so the stream endpoint never serves a half-written file
+        await transcode_file(writer.path, encoded_path + ".part", codec)
+        os.replace(encoded_path + ".part", encoded_path)
+    except Exception as e:
+        print(f"⚠️  {e}; keeping wav")
+        try:
+            os.remove(encoded_path + ".part")
+        except OSError:
+            pass
+        return f"/audio/{wav_filename}"
+    try:
+        os.remove(writer.path)
+    except OSError:
+        # Still held open by a progressive reader (Windows); leave the wav behind
+        pass
+
+    print(f"Audio saved to {encoded_path}")
+    return f"/audio/{encoded_filename}"
@@ -0,0 +1,282 @@
+"""Offline end-to-end benchmark against local fakes of the xAI APIs (see fakes.py).
+
+Starts fake chat (gRPC), realtime TTS (websocket) and video (HTTP) servers,
+then runs each scenario in a fresh process and scratch directory pointed at
+them, so no API credits are spent and caches from one scenario never help
+another. Reports p50/p95/p99 latency, throughput and peak RSS per scenario.
+
+    cd backend
+    python benchmarks/bench_offline.py --requests 8 --concurrency 4 --output baseline.json
+    python benchmarks/bench_offline.py --baseline baseline.json  # exits 1 on a regression
+
+Scenarios: generate_audio, generate_videos, combine_videos (audio/video
+modules called directly), generate_briefing (POST /generate-briefing) and
+ws_briefing (/ws/briefing with audio and video) against a local uvicorn.
+Requires ffmpeg on PATH.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeChatServer, FakeRealtimeServer, FakeVideoServer, script_json  # noqa: E402
+
+SCENARIOS = ("generate_audio", "generate_videos", "combine_videos", "generate_briefing", "ws_briefing")
+
+
+def percentile(values: list, p: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+
+def measure(op, requests: int, concurrency: int) -> dict:
+    """Call op(i) for i in range(requests), concurrency at a time, and summarise latencies.
+
+    op may return a dict of extra named durations (seconds); their medians are reported too.
+    """
+    latencies, extras, errors = [], {}, []
+
+    def timed(i):
+        start = time.perf_counter()
+        try:
+            extra = op(i) or {}
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return
+        latencies.append(time.perf_counter() - start)
+        for name, value in extra.items():
+            extras.setdefault(name, []).append(value)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(requests)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    result = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "p50_seconds": round(percentile(latencies, 50), 3),
+        "p95_seconds": round(percentile(latencies, 95), 3),
+        "p99_seconds": round(percentile(latencies, 99), 3),
+        "throughput_per_sec": round(len(latencies) / wall, 3),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    for name, values in extras.items():
+        result[f"{name}_p50_seconds"] = round(percentile(sorted(values), 50), 3)
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend():
+    """Run main.app on a local uvicorn in this process; returns its port."""
+    import uvicorn
+    import main
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return port
+
+
+def scenario_op(scenario: str, segments: int):
+    """Build op(i) for one scenario. Runs inside the child process."""
+    run = uuid.uuid4().hex[:8]
+
+    def script(i):
+        return script_json(f"{scenario}-{run}-{i}", segments)["segments"]
+
+    if scenario == "generate_audio":
+        from briefing_gen import run_on_main_loop, bind_event_loop
+        from audio_gen import generate_audio
+
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        bind_event_loop(loop)
+
+        def op(i):
+            run_on_main_loop(generate_audio(script(i), f"bench_{run}_{i}.wav"))
+        return op
+
+    if scenario == "generate_videos":
+        from video_gen import generate_videos
+
+        def op(i):
+            if not any(generate_videos(script(i))):
+                raise RuntimeError("no segment video was generated")
+        return op
+
+    if scenario == "combine_videos":
+        from video_gen import combine_videos
+
+        clip_url = os.environ["BENCH_CLIP_URL"]
+
+        def op(i):
+            if not combine_videos([{"url": clip_url} for _ in range(segments)], output_filename=f"bench_{run}_{i}.mp4"):
+                raise RuntimeError("combine failed")
+        return op
+
+    port = start_backend()
+    if scenario == "generate_briefing":
+        import httpx
+
+        def op(i):
+            response = httpx.post(f"http://127.0.0.1:{port}/generate-briefing",
+                                  json={"topic": f"bench {run} {i}", "audio_format": "wav"}, timeout=600)
+            response.raise_for_status()
+        return op
+
+    if scenario == "ws_briefing":
+        from websockets.asyncio.client import connect
+
+        async def briefing(i):
+            start = time.perf_counter()
+            timings = {}
+            async with connect(f"ws://127.0.0.1:{port}/ws/briefing", max_size=None) as ws:
+                await ws.send(json.dumps({"topic": f"bench {run} {i}", "generateAudio": True,
+                                          "generateVideo": True, "audioFormat": "wav"}))
+                async for message in ws:
+                    event = json.loads(message)
+                    timings.setdefault(f"first_{event['type']}", time.perf_counter() - start)
+                    if event["type"] == "error":
+                        raise RuntimeError(event.get("message"))
+                    if event["type"] == "result":
+                        break
+            return {name: timings[name] for name in ("first_field", "first_audio_stream", "first_video_segment")
+                    if name in timings}
+
+        return lambda i: asyncio.run(briefing(i))
+
+    raise ValueError(f"Unknown scenario '{scenario}'")
+
+
+def run_child(args):
+    # Keep the pipeline's progress output out of the report
+    sys.stdout = open(os.devnull, "w")
+    result = measure(scenario_op(args.child, args.segments), args.requests, args.concurrency)
+    with open(args.result_file, "w") as f:
+        json.dump(result, f)
+    os._exit(0)  # don't wait on pools and servers still winding down
+
+
+def run_scenario(scenario: str, args, fake_env: dict) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        result_file = os.path.join(directory, "result.json")
+        env = {**os.environ, **fake_env, "XAI_API_KEY": os.getenv("XAI_API_KEY") or "bench"}
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", scenario, "--result-file", result_file,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--segments", str(args.segments)],
+            cwd=directory, env=env, capture_output=True, text=True, timeout=args.timeout,
+        )
+        if not os.path.exists(result_file):
+            return {"errors": args.requests, "first_error": process.stderr.strip()[-500:]}
+        with open(result_file) as f:
+            return json.load(f)
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    found = []
+    for scenario, result in results.items():
+        base = baseline.get(scenario)
+        if not base:
+            continue
+        if result.get("errors", 0) > base.get("errors", 0):
+            found.append(f"{scenario}: errors {base.get('errors', 0)} -> {result['errors']}")
+        if result.get("p95_seconds", 0) > base.get("p95_seconds", 0) * (1 + tolerance):
+            found.append(f"{scenario}: p95 {base['p95_seconds']}s -> {result['p95_seconds']}s")
+        if result.get("throughput_per_sec", 0) < base.get("throughput_per_sec", 0) * (1 - tolerance):
+            found.append(f"{scenario}: throughput {base['throughput_per_sec']}/s -> {result['throughput_per_sec']}/s")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset to run")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--segments", type=int, default=6, help="script segments per briefing")
+    parser.add_argument("--tokens-per-sec", type=float, default=200, help="fake chat stream rate")
+    parser.add_argument("--tts-speedup", type=float, default=10, help="fake TTS speed relative to real time")
+    parser.add_argument("--video-latency", type=float, default=3.0, help="fake render time per clip (seconds)")
+    parser.add_argument("--video-failure-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=900, help="per-scenario limit (seconds)")
+    parser.add_argument("--output", help="write results as JSON (e.g. a new baseline)")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before flagging")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    chat = FakeChatServer(tokens_per_sec=args.tokens_per_sec, segments=args.segments).start()
+    realtime = FakeRealtimeServer(speedup=args.tts_speedup).start()
+    video = FakeVideoServer(latency=args.video_latency, failure_rate=args.video_failure_rate).start()
+    fake_env = {**chat.env(), **realtime.env(), **video.env(), "BENCH_CLIP_URL": video.clip_url(10)}
+    video.clip(10)  # render outside the timed scenarios
+
+    results = {}
+    try:
+        for scenario in args.scenarios.split(","):
+            results[scenario] = run_scenario(scenario, args, fake_env)
+            print(f"✓ {scenario}", file=sys.stderr)
+    finally:
+        for fake in (chat, realtime, video):
+            fake.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        columns = ["errors", "p50_seconds", "p95_seconds", "p99_seconds", "throughput_per_sec", "peak_rss_mb"]
+        print(f"{'scenario':>18}" + "".join(f"{column:>20}" for column in columns))
+        for scenario, result in results.items():
+            print(f"{scenario:>18}" + "".join(f"{str(result.get(column, '-')):>20}" for column in columns))
+            for name, value in result.items():
+                if name.startswith("first_") and name.endswith("_p50_seconds"):
+                    print(f"{'':>18}  {name}: {value}")
+                elif name == "first_error":
+                    print(f"{'':>18}  error: {value}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"❌ Regression: {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
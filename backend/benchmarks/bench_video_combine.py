@@ -0,0 +1,127 @@
+"""Concurrency benchmark for video_gen.combine_videos.
+
+Runs many combines at once with a stubbed downloader (clips are copied from
+locally rendered test videos instead of fetched over HTTP) and reports
+throughput at increasing parallelism. Every job uses clips of a different
+length, so each output's duration shows whether it picked up another job's
+segments. Exits 1 if any output is wrong or a scratch directory is left
+behind. Runs offline; requires ffmpeg on PATH.
+
+    cd backend
+    python benchmarks/bench_video_combine.py --jobs 16 --segments 6 --parallel 1,4,16
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# video_gen imports script_gen, which builds an xAI client at import time; no API call is ever made
+os.environ.setdefault("XAI_API_KEY", "bench")
+
+import video_gen  # noqa: E402
+
+CLIP_SECONDS = (1, 2, 3)
+
+
+def render_clips(directory: str) -> dict:
+    """Render one small test clip per length in CLIP_SECONDS."""
+    clips = {}
+    for seconds in CLIP_SECONDS:
+        path = os.path.join(directory, f"clip_{seconds}s.mp4")
+        subprocess.run([
+            'ffmpeg', '-f', 'lavfi', '-i', f'testsrc=duration={seconds}:size=320x180:rate=24',
+            '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-y', path
+        ], check=True, capture_output=True)
+        clips[seconds] = path
+    return clips
+
+
+def stub_downloader(clips: dict):
+    """Replace download_video with a local copy; URLs look like stub://<seconds>/<job>/<segment>."""
+    def download_video(url: str, output_path: str):
+        seconds = int(url[len("stub://"):].split("/")[0])
+        shutil.copyfile(clips[seconds], output_path)
+    video_gen.download_video = download_video
+
+
+def duration_of(path: str) -> float:
+    probe = subprocess.run(['ffmpeg', '-i', path], capture_output=True, text=True)
+    match = re.search(r"Duration: (\d+):(\d+):([\d.]+)", probe.stderr)
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def run_job(job: int, segments: int) -> dict:
+    seconds = CLIP_SECONDS[job % len(CLIP_SECONDS)]
+    video_urls = [{"url": f"stub://{seconds}/{job}/{i}"} for i in range(segments)]
+    output_filename = f"bench_combine_{job}.mp4"
+    start = time.perf_counter()
+    output_path = video_gen.combine_videos(video_urls, output_filename=output_filename)
+    elapsed = time.perf_counter() - start
+    expected = seconds * segments
+    actual = duration_of(output_path) if output_path else 0.0
+    if output_path:
+        os.remove(output_path)
+    return {"seconds": elapsed, "ok": abs(actual - expected) < 0.5}
+
+
+def run(jobs: int, segments: int, parallel: int) -> dict:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        results = list(pool.map(lambda job: run_job(job, segments), range(jobs)))
+    wall = time.perf_counter() - start
+    latencies = sorted(r["seconds"] for r in results)
+    return {
+        "parallel": parallel,
+        "jobs": jobs,
+        "wall_seconds": round(wall, 2),
+        "jobs_per_sec": round(jobs / wall, 2),
+        "job_p50_seconds": round(latencies[len(latencies) // 2], 2),
+        "wrong_outputs": sum(1 for r in results if not r["ok"]),
+        "leftover_scratch": len(os.listdir(video_gen.VIDEO_SCRATCH_DIR)) if os.path.isdir(video_gen.VIDEO_SCRATCH_DIR) else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--segments", type=int, default=6)
+    parser.add_argument("--parallel", default=f"1,4,{os.cpu_count() or 4}", help="comma-separated parallelism levels")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as clip_dir:
+        stub_downloader(render_clips(clip_dir))
+        # Keep combine_videos' progress output out of the report
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            results = [run(args.jobs, args.segments, int(p)) for p in args.parallel.split(",")]
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        columns = list(results[0].keys())
+        print("".join(f"{column:>18}" for column in columns))
+        for result in results:
+            print("".join(f"{str(result[column]):>18}" for column in columns))
+
+    failed = [r for r in results if r["wrong_outputs"] or r["leftover_scratch"]]
+    for r in failed:
+        print(f"❌ parallel {r['parallel']}: {r['wrong_outputs']} wrong outputs, "
+              f"{r['leftover_scratch']} leftover scratch directories", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Throughput benchmark for the worker pool (worker.py + the shared job store).
+
+Starts N worker processes against a throwaway job database, queues a batch
+of briefing jobs and reports how fast they are drained. Upstreams are
+mocked: each fake briefing waits on simulated API latency and burns some
+CPU (standing in for JSON parsing, audio encoding and the like) while it
+emits a realistic number of events, so scaling shows both how many
+briefings a process can keep in flight and when the host's cores run out.
+
+    cd backend
+    python benchmarks/bench_workers.py --jobs 40 --workers 1,2,4 --concurrency 1
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def fake_briefing(topic: str, location: str, enable_audio: bool, enable_video: bool, audio_format: str = None,
+                  priority: int = 1, latency: float = 0.3, cpu_rounds: int = 20000, events: int = 20):
+    """Stand-in for run_briefing: latency seconds of waiting and cpu_rounds of hashing, spread over events."""
+    digest = topic.encode()
+    for i in range(events):
+        time.sleep(latency / events)
+        for _ in range(cpu_rounds // events):
+            digest = hashlib.sha256(digest).digest()
+        yield {"type": "chunk", "content": digest.hex()[:16]}
+    yield {"type": "result", "content": json.dumps({"headline": topic, "audio_url": "", "video_url": ""})}
+
+
+def worker_process(ready, stop, concurrency: int, latency: float, cpu_rounds: int):
+    # Keep the worker's per-job output out of the report
+    sys.stdout = open(os.devnull, "w")
+    import worker
+    from job_store import job_store
+
+    def pipeline(**params):
+        return fake_briefing(**params, latency=latency, cpu_rounds=cpu_rounds)
+
+    stop_flag = threading.Event()
+    threading.Thread(target=lambda: (stop.wait(), stop_flag.set()), daemon=True).start()
+    ready.release()
+    worker.serve(concurrency, pipeline=pipeline, store=job_store, stop=stop_flag, poll_interval=0.02)
+
+
+def run(store, workers: int, jobs: int, concurrency: int, latency: float, cpu_rounds: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    ready, stop = ctx.Semaphore(0), ctx.Event()
+    processes = [ctx.Process(target=worker_process, args=(ready, stop, concurrency, latency, cpu_rounds))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.acquire()
+
+    run_id = f"{workers}-{time.time()}"
+    params = {"location": "worldwide", "enable_audio": True, "enable_video": False, "audio_format": "wav"}
+    start = time.perf_counter()
+    job_ids = [store.enqueue((run_id, i), {**params, "topic": f"topic {i}"}, 1)[0] for i in range(jobs)]
+    pending = set(job_ids)
+    while pending:
+        time.sleep(0.02)
+        pending = {job_id for job_id in pending if store.get(job_id)["status"] in ("queued", "running")}
+    wall = time.perf_counter() - start
+
+    stop.set()
+    for process in processes:
+        process.join()
+
+    jobs_info = [store.get(job_id) for job_id in job_ids]
+    return {
+        "workers": workers,
+        "jobs": jobs,
+        "wall_seconds": round(wall, 2),
+        "jobs_per_sec": round(jobs / wall, 2),
+        "failed": sum(1 for job in jobs_info if job["status"] != "done"),
+        "distinct_workers": len({job["worker"] for job in jobs_info}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker process counts")
+    parser.add_argument("--concurrency", type=int, default=1, help="briefings each worker runs at once")
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated upstream seconds per briefing")
+    parser.add_argument("--cpu-rounds", type=int, default=20000, help="sha256 rounds per briefing")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Worker processes inherit the environment, so they all share this database
+        os.environ["JOB_DB_PATH"] = os.path.join(directory, "bench_jobs.db")
+        os.environ.setdefault("XAI_API_KEY", "bench")
+        from job_store import job_store
+        results = [run(job_store, int(w), args.jobs, args.concurrency, args.latency, args.cpu_rounds)
+                   for w in args.workers.split(",")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    columns = list(results[0].keys())
+    print("".join(f"{column:>18}" for column in columns))
+    for result in results:
+        print("".join(f"{str(result[column]):>18}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
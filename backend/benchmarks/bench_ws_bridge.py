@@ -0,0 +1,171 @@
+"""Idle-cost benchmark for the /ws/briefing event bridge.
+
+Compares the old consumer (per-socket thread + queue.Queue polled with
+get(timeout=0.01) and asyncio.sleep(0.001)) against Flight.subscribe_async()
+with N sockets attached to one idle flight. Reports process CPU time,
+event-loop wakeups (selector.select calls), consumer wakeups per socket,
+event-loop lag (how late a 10 ms timer fires) and the latency to deliver
+one final event to every socket.
+
+    cd backend
+    python benchmarks/bench_ws_bridge.py --sockets 500 --idle 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import selectors
+import sys
+import threading
+import time
+from contextlib import aclosing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from singleflight import Flight  # noqa: E402
+
+
+class CountingSelector(selectors.DefaultSelector):
+    """Selector that counts how often the event loop wakes up to poll."""
+
+    def __init__(self):
+        super().__init__()
+        self.selects = 0
+
+    def select(self, timeout=None):
+        self.selects += 1
+        return super().select(timeout)
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.received_at = None
+
+    async def send_json(self, data):
+        if data.get("type") == "result":
+            self.received_at = time.perf_counter()
+
+
+async def legacy_consumer(ws, flight, wakeups, index):
+    """The polling loop /ws/briefing used before the event-driven bridge."""
+    message_queue = queue.Queue()
+
+    def generator_thread():
+        try:
+            for message in flight.subscribe():
+                message_queue.put(("message", message))
+        finally:
+            message_queue.put(("done", None))
+
+    threading.Thread(target=generator_thread, daemon=True).start()
+    while True:
+        wakeups[index] += 1
+        try:
+            msg_type, data = message_queue.get(timeout=0.01)
+            if msg_type == "message":
+                await ws.send_json(data)
+                await asyncio.sleep(0.001)
+            elif msg_type == "done":
+                break
+        except queue.Empty:
+            await asyncio.sleep(0.001)
+
+
+async def bridge_consumer(ws, flight, wakeups, index):
+    """The current loop: await Flight.subscribe_async()."""
+    async with aclosing(flight.subscribe_async()) as events:
+        async for message in events:
+            wakeups[index] += 1
+            await ws.send_json(message)
+
+
+async def probe_lag(samples: list, stop: asyncio.Event):
+    """Measure how late a 10 ms sleep wakes up while the consumers are idle."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append(time.perf_counter() - start - 0.01)
+
+
+async def run_scenario(consumer, sockets: int, idle: float, selector: CountingSelector) -> dict:
+    flight = Flight("bench")
+    flight.publish({"type": "status", "content": "started"})
+    websockets = [FakeWebSocket() for _ in range(sockets)]
+    wakeups = [0] * sockets
+    tasks = [asyncio.create_task(consumer(ws, flight, wakeups, i)) for i, ws in enumerate(websockets)]
+
+    # Let every consumer attach and drain the first event
+    await asyncio.sleep(0.5)
+
+    wakeups_before = sum(wakeups)
+    selects_before = selector.selects
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    await asyncio.sleep(idle)
+    wall = time.perf_counter() - wall_before
+    cpu = time.process_time() - cpu_before
+    threads = threading.active_count()
+    idle_wakeups = sum(wakeups) - wakeups_before
+    idle_selects = selector.selects - selects_before
+
+    # Separate window for the lag probe so its own timers don't count as wakeups above
+    lag_samples, stop = [], asyncio.Event()
+    probe = asyncio.create_task(probe_lag(lag_samples, stop))
+    await asyncio.sleep(1.0)
+    stop.set()
+    await probe
+
+    # Deliver one final event and time how long until every socket has it
+    sent_at = time.perf_counter()
+    threading.Thread(target=lambda: (flight.publish({"type": "result"}), flight.finish())).start()
+    await asyncio.gather(*tasks)
+    latencies = sorted(ws.received_at - sent_at for ws in websockets)
+
+    return {
+        "sockets": sockets,
+        "idle_seconds": round(wall, 3),
+        "idle_cpu_seconds": round(cpu, 3),
+        "idle_cpu_percent": round(100 * cpu / wall, 1),
+        "loop_wakeups_per_sec": round(idle_selects / wall, 1),
+        "consumer_wakeups_per_socket_per_sec": round(idle_wakeups / sockets / wall, 2),
+        "loop_lag_max_ms": round(1000 * max(lag_samples), 2),
+        "threads": threads,
+        "delivery_p50_ms": round(1000 * latencies[len(latencies) // 2], 2),
+        "delivery_max_ms": round(1000 * latencies[-1], 2),
+    }
+
+
+def run(consumer, sockets: int, idle: float) -> dict:
+    selector = CountingSelector()
+    loop = asyncio.SelectorEventLoop(selector)
+    try:
+        return loop.run_until_complete(run_scenario(consumer, sockets, idle, selector))
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=500)
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds of idle time to measure")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = {
+        "before (thread + Queue polling)": run(legacy_consumer, args.sockets, args.idle),
+        "after (Flight.subscribe_async)": run(bridge_consumer, args.sockets, args.idle),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    columns = list(next(iter(results.values())).keys())
+    print(f"{'metric':<38}" + "".join(f"{name:>34}" for name in results))
+    for column in columns:
+        print(f"{column:<38}" + "".join(f"{str(r[column]):>34}" for r in results.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Soak/load test for /ws/briefing: how many sessions one uvicorn process can hold.
+
+Runs the app in its own process against the local API fakes (see fakes.py)
+and opens waves of WebSocket clients against it. Each wave varies the
+number of clients, how much their topics overlap (clients on the same topic
+share one briefing via singleflight) and how slowly they read. Reported per
+wave:
+
+- delivery latency: from the producer publishing an event to a client
+  receiving it (matched by job id and seq; both processes share a clock).
+  Events published before a client joined are replayed and not counted
+- event-loop lag of the server (how late a periodic timer fires)
+- peak thread count and RSS of the server process
+- dropped sessions (failed to connect, closed or timed out before the result)
+
+Rows are grouped into one capacity curve per (overlap, read delay) series,
+and the largest client count still within --slo with nothing dropped is
+called out.
+
+    cd backend
+    python benchmarks/bench_ws_load.py --clients 100,500,1000,2000 --overlap 0,0.9 --read-delay 0,0.05
+
+Clients and the fakes share the parent process; the client loop's own lag is
+reported too, so a saturated client side is visible rather than being
+mistaken for a slow server. Upstream rate limits are lifted in the server
+(API_RATE_*, API_MAX_CONCURRENCY) unless set in the environment, since the
+point is the process's fan-out capacity, not the API quota.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_offline import free_port, percentile  # noqa: E402
+from fakes import FakeChatServer, FakeRealtimeServer, FakeVideoServer  # noqa: E402
+
+UNTHROTTLED = {
+    "API_MAX_CONCURRENCY": "10000",
+    "API_RATE_CHAT": "10000", "API_BURST_CHAT": "10000",
+    "API_RATE_TTS": "10000", "API_BURST_TTS": "10000",
+    "API_RATE_VIDEO": "10000", "API_BURST_VIDEO": "10000",
+}
+
+
+def raise_fd_limit():
+    # Every session is a socket on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def rss_mb() -> float:
+    """Current resident set size, falling back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def lag_probe(samples: list, interval: float):
+    """Append (time, lag, threads, rss_mb) every interval; lag is how late the timer fired."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.time(), time.perf_counter() - start - interval, threading.active_count(), rss_mb()))
+
+
+def run_server(args):
+    """Child process: serve main.app with publish timestamps and a lag probe until stdin closes."""
+    raise_fd_limit()
+    # Keep the pipeline's progress output out of the report
+    sys.stdout = open(os.devnull, "w")
+    import uvicorn
+    import main
+    from singleflight import Flight
+
+    published = []
+    publish = Flight.publish
+
+    def timed_publish(flight, event):
+        published.append((flight.job_id, event.get("seq"), time.time()))
+        publish(flight, event)
+
+    Flight.publish = timed_publish
+
+    samples, tasks = [], []
+
+    @main.app.on_event("startup")
+    async def start_lag_probe():
+        tasks.append(asyncio.create_task(lag_probe(samples, args.sample_interval)))
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=args.port, log_level="error",
+                                           backlog=args.backlog))
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+
+    sys.stdin.read()  # the parent closes our stdin when the wave is over
+    with open(args.result_file, "w") as f:
+        json.dump({"samples": samples, "published": published}, f)
+    os._exit(0)  # don't wait on sessions and pipeline threads still winding down
+
+
+class Server:
+    """The app under test in a fresh child process (fresh memory, threads and caches per wave)."""
+
+    def __init__(self, args, fake_env: dict, directory: str):
+        self.port = free_port()
+        self.result_file = os.path.join(directory, "server.json")
+        env = {**UNTHROTTLED, **os.environ, **fake_env,
+               "XAI_API_KEY": os.getenv("XAI_API_KEY") or "bench",
+               "JOB_DB_PATH": os.path.join(directory, "jobs.db")}
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(self.port),
+             "--result-file", self.result_file, "--sample-interval", str(args.sample_interval),
+             "--backlog", str(args.backlog)],
+            cwd=directory, env=env, stdin=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        self._wait_ready()
+
+    def _wait_ready(self, timeout: float = 60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"server exited: {self.process.stderr.read()[-500:]}")
+            try:
+                httpx.get(f"http://127.0.0.1:{self.port}/health", timeout=1)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        raise RuntimeError("server did not start")
+
+    def stop(self) -> dict:
+        self.process.stdin.close()
+        self.process.wait(timeout=120)
+        with open(self.result_file) as f:
+            return json.load(f)
+
+
+class Session:
+    def __init__(self):
+        self.job_id = None
+        self.joined = None  # when the request was sent; events published earlier are replayed, not live
+        self.received = []  # (seq, receive time)
+        self.first_event = None
+        self.completed = False
+        self.failure = None
+
+
+async def session(port: int, topic: str, read_delay: float, args, delay: float) -> Session:
+    from websockets.asyncio.client import connect
+
+    await asyncio.sleep(delay)
+    result = Session()
+    start = time.perf_counter()
+
+    async def converse():
+        async with connect(f"ws://127.0.0.1:{port}/ws/briefing", max_size=None, open_timeout=args.timeout) as ws:
+            await ws.send(json.dumps({"topic": topic, "generateAudio": args.audio,
+                                      "generateVideo": args.video, "audioFormat": "wav"}))
+            result.joined = time.time()
+            async for message in ws:
+                now = time.time()
+                event = json.loads(message)
+                if result.first_event is None:
+                    result.first_event = time.perf_counter() - start
+                if event.get("type") == "job":
+                    result.job_id = event["jobId"]
+                elif "seq" in event:
+                    result.received.append((event["seq"], now))
+                if event.get("type") == "error":
+                    result.failure = event.get("message")
+                    return
+                if event.get("type") == "result":
+                    result.completed = True
+                    return
+                if read_delay:
+                    await asyncio.sleep(read_delay)
+
+    try:
+        await asyncio.wait_for(converse(), args.timeout)
+    except asyncio.TimeoutError:
+        result.failure = "timed out"
+    except Exception as e:
+        result.failure = f"{type(e).__name__}: {e}"
+    if not result.completed and result.failure is None:
+        result.failure = "closed before result"
+    return result
+
+
+async def run_clients(port: int, clients: int, overlap: float, read_delay: float, args):
+    """Open clients sessions, spread over the ramp, with topics shared according to overlap."""
+    run = uuid.uuid4().hex[:8]
+    topics = max(1, round(clients * (1 - overlap)))
+    client_samples = []
+    probe = asyncio.create_task(lag_probe(client_samples, args.sample_interval))
+    try:
+        sessions = await asyncio.gather(*(
+            session(port, f"load {run} {i % topics}", read_delay, args, args.ramp * i / clients)
+            for i in range(clients)
+        ))
+    finally:
+        probe.cancel()
+    return sessions, topics, [sample[1] for sample in client_samples]
+
+
+def summarise(sessions: list, topics: int, server: dict, client_lags: list) -> dict:
+    published = {(job_id, seq): ts for job_id, seq, ts in server["published"]}
+    latencies = sorted(
+        received - published[(s.job_id, seq)]
+        for s in sessions for seq, received in s.received
+        if published.get((s.job_id, seq), 0) >= s.joined
+    )
+    lags = sorted(sample[1] for sample in server["samples"])
+    failures = [s.failure for s in sessions if s.failure]
+    result = {
+        "clients": len(sessions),
+        "briefings": topics,
+        "completed": sum(1 for s in sessions if s.completed),
+        "dropped": len(failures),
+        "messages": len(latencies),
+        "delivery_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "delivery_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "first_event_p50_ms": round(percentile(sorted(s.first_event for s in sessions if s.first_event), 50) * 1000, 1),
+        "loop_lag_p99_ms": round(percentile(lags, 99) * 1000, 1),
+        "loop_lag_max_ms": round(max(lags, default=0) * 1000, 1),
+        "peak_threads": max((sample[2] for sample in server["samples"]), default=0),
+        "peak_rss_mb": round(max((sample[3] for sample in server["samples"]), default=0), 1),
+        "client_lag_p99_ms": round(percentile(sorted(client_lags), 99) * 1000, 1),
+    }
+    if failures:
+        result["first_failure"] = failures[0]
+    return result
+
+
+def run_wave(args, fake_env: dict, clients: int, overlap: float, read_delay: float) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        server = Server(args, fake_env, directory)
+        try:
+            sessions, topics, client_lags = asyncio.run(run_clients(server.port, clients, overlap, read_delay, args))
+        finally:
+            stats = server.stop()
+    return {"overlap": overlap, "read_delay": read_delay, **summarise(sessions, topics, stats, client_lags)}
+
+
+def capacity(rows: list, slo_ms: float):
+    """Largest client count with nothing dropped and p99 delivery within slo_ms (None if none qualifies)."""
+    within = [row["clients"] for row in rows if not row["dropped"] and row["delivery_p99_ms"] <= slo_ms]
+    return max(within, default=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="100,250,500,1000", help="comma-separated concurrent session counts")
+    parser.add_argument("--overlap", default="0.9",
+                        help="comma-separated fractions of clients sharing a topic (0 = every client unique)")
+    parser.add_argument("--read-delay", default="0",
+                        help="comma-separated seconds each client sleeps after every message (slow readers)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which each wave's clients connect")
+    parser.add_argument("--timeout", type=float, default=300, help="per-session limit (seconds)")
+    parser.add_argument("--slo", type=float, default=500, help="p99 delivery latency budget for the capacity line (ms)")
+    parser.add_argument("--audio", action="store_true", help="request audio (fake TTS) in every session")
+    parser.add_argument("--video", action="store_true", help="request video (fake renders) in every session")
+    parser.add_argument("--segments", type=int, default=6, help="script segments per briefing")
+    parser.add_argument("--tokens-per-sec", type=float, default=200, help="fake chat stream rate")
+    parser.add_argument("--sample-interval", type=float, default=0.05, help="lag probe period (seconds)")
+    parser.add_argument("--backlog", type=int, default=4096, help="listen backlog of the server socket")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        run_server(args)
+        return
+
+    raise_fd_limit()
+    chat = FakeChatServer(tokens_per_sec=args.tokens_per_sec, segments=args.segments, max_streams=256).start()
+    realtime = FakeRealtimeServer().start()
+    video = FakeVideoServer().start()
+    fake_env = {**chat.env(), **realtime.env(), **video.env()}
+
+    series = {}
+    try:
+        for overlap in (float(o) for o in args.overlap.split(",")):
+            for read_delay in (float(d) for d in args.read_delay.split(",")):
+                rows = series.setdefault((overlap, read_delay), [])
+                for clients in (int(c) for c in args.clients.split(",")):
+                    rows.append(run_wave(args, fake_env, clients, overlap, read_delay))
+                    print(f"✓ {clients} clients, overlap {overlap}, read delay {read_delay}s", file=sys.stderr)
+    finally:
+        for fake in (chat, realtime, video):
+            fake.stop()
+
+    if args.json:
+        print(json.dumps([{"overlap": overlap, "read_delay": read_delay, "capacity": capacity(rows, args.slo),
+                           "waves": rows} for (overlap, read_delay), rows in series.items()], indent=2))
+        return
+
+    columns = ["clients", "briefings", "dropped", "delivery_p50_ms", "delivery_p99_ms", "first_event_p50_ms",
+               "loop_lag_p99_ms", "loop_lag_max_ms", "peak_threads", "peak_rss_mb", "client_lag_p99_ms"]
+    for (overlap, read_delay), rows in series.items():
+        print(f"\n📈 overlap {overlap}, read delay {read_delay}s")
+        print("".join(f"{column:>19}" for column in columns))
+        for row in rows:
+            print("".join(f"{str(row[column]):>19}" for column in columns))
+            if "first_failure" in row:
+                print(f"{'':>19}first failure: {row['first_failure']}")
+        best = capacity(rows, args.slo)
+        print(f"capacity: {best} clients within p99 {args.slo:g} ms" if best
+              else f"capacity: no wave met p99 {args.slo:g} ms with nothing dropped")
+
+
+if __name__ == "__main__":
+    main()
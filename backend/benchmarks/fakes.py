@@ -0,0 +1,337 @@
+"""Local stand-ins for the xAI APIs the backend calls, for offline benchmarks.
+
+FakeChatServer speaks the SDK's gRPC chat protocol and streams briefing or
+script JSON at a configurable token rate. FakeRealtimeServer is a realtime
+TTS websocket that answers every utterance with PCM deltas. FakeVideoServer
+serves /v1/videos/generations, status polling and small mp4 clips, with
+configurable render latency and failure rate.
+
+Point the backend at them with XAI_API_HOST, XAI_REALTIME_URL and
+XAI_VIDEO_API_URL (see env() on each fake). Run standalone to keep them up
+for manual testing:
+
+    cd backend
+    python benchmarks/fakes.py
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import grpc
+import websockets
+from xai_sdk.proto import chat_pb2, chat_pb2_grpc
+
+SAMPLE_RATE = 24000
+
+
+def briefing_json(topic: str) -> dict:
+    return {
+        "headline": f"Developments in {topic}",
+        "summary": f"A fake briefing about {topic}, generated locally for benchmarking.",
+        "confirmed_facts": [
+            {"text": f"Fact {i} about {topic}.", "sourceUrl": f"https://x.com/user/status/{i}"} for i in range(3)
+        ],
+        "unconfirmed_claims": [f"Claim {i} about {topic}." for i in range(2)],
+        "recent_changes": [f"Update about {topic}."],
+        "watch_next": [f"{topic} follow-up"],
+        "sources": [
+            {
+                "account_handle": f"@source{i}",
+                "display_name": f"Source {i}",
+                "excerpt": f"Statement {i} on {topic}.",
+                "time_ago": f"{i + 1}h ago",
+                "post_url": f"https://x.com/source{i}/status/{i}",
+                "profile_image_url": "https://pbs.twimg.com/profile_images/fake.jpg",
+                "label": "journalist",
+            }
+            for i in range(3)
+        ],
+        "media": [
+            {"url": "https://pbs.twimg.com/media/fake.jpg", "type": "image", "caption": topic,
+             "sourceUrl": "https://x.com/user/status/1"},
+            {"url": "https://video.twimg.com/fake.mp4", "type": "video", "caption": "dropped by the X video filter",
+             "sourceUrl": "https://x.com/user/status/2"},
+        ],
+    }
+
+
+def script_json(seed: str, segments: int) -> dict:
+    # Narration is unique per briefing so the TTS and video caches don't flatter repeated runs
+    return {"segments": [
+        {
+            "start_sec": 10 * i,
+            "end_sec": 10 * i + 10,
+            "narration": f"Segment {i + 1} of briefing {seed}. Here is what we know so far and what comes next.",
+            "visuals": f"Text card reading 'Segment {i + 1}'",
+            "overlay_text": f"Part {i + 1}",
+        }
+        for i in range(segments)
+    ]}
+
+
+class ChatServicer(chat_pb2_grpc.ChatServicer):
+    def __init__(self, tokens_per_sec: float, first_token_delay: float, segments: int):
+        self.tokens_per_sec = tokens_per_sec
+        self.first_token_delay = first_token_delay
+        self.segments = segments
+        self.requests = 0
+
+    def _respond(self, request) -> str:
+        self.requests += 1
+        prompt = str(request)
+        if "production script" in prompt:
+            return json.dumps(script_json(hashlib.sha256(prompt.encode()).hexdigest()[:12], self.segments))
+        match = re.search(r"Generate (?:a news briefing|content) for(?: topic)?: ([^\"\\\n]+)", prompt)
+        return json.dumps(briefing_json(match.group(1) if match else "news"))
+
+    def GetCompletion(self, request, context):
+        content = self._respond(request)
+        time.sleep(self.first_token_delay + len(content) / 4 / self.tokens_per_sec)
+        return chat_pb2.GetChatCompletionResponse(id=uuid.uuid4().hex, outputs=[chat_pb2.CompletionOutput(
+            finish_reason="REASON_STOP", message=chat_pb2.CompletionMessage(content=content, role="ROLE_ASSISTANT"),
+        )])
+
+    def GetCompletionChunk(self, request, context):
+        content = self._respond(request)
+        response_id = uuid.uuid4().hex
+        time.sleep(self.first_token_delay)
+        # Roughly four characters per token
+        for start in range(0, len(content), 4):
+            if not context.is_active():
+                return
+            yield chat_pb2.GetChatCompletionChunk(id=response_id, outputs=[chat_pb2.CompletionOutputChunk(
+                delta=chat_pb2.Delta(content=content[start:start + 4], role="ROLE_ASSISTANT"),
+            )])
+            time.sleep(1 / self.tokens_per_sec)
+
+
+class FakeChatServer:
+    """gRPC chat endpoint that streams canned briefing/script JSON at tokens_per_sec."""
+
+    def __init__(self, tokens_per_sec: float = 200, first_token_delay: float = 0.3, segments: int = 6,
+                 max_streams: int = 64):
+        self.servicer = ChatServicer(tokens_per_sec, first_token_delay, segments)
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_streams))
+        chat_pb2_grpc.add_ChatServicer_to_server(self.servicer, self._server)
+        self.port = self._server.add_insecure_port("localhost:0")
+
+    def start(self):
+        self._server.start()
+        return self
+
+    def stop(self):
+        self._server.stop(grace=None)
+
+    def env(self) -> dict:
+        # The SDK uses local (plaintext) credentials for localhost: hosts
+        return {"XAI_API_HOST": f"localhost:{self.port}"}
+
+
+class FakeRealtimeServer:
+    """Realtime TTS websocket: each response.create is answered with PCM deltas.
+
+    Audio length follows the text (chars_per_sec of speech); it is sent
+    speedup times faster than real time in delta_ms chunks.
+    """
+
+    def __init__(self, chars_per_sec: float = 15, speedup: float = 10, delta_ms: int = 100):
+        self.chars_per_sec = chars_per_sec
+        self.speedup = speedup
+        self.delta_ms = delta_ms
+        self.port = None
+        self.utterances = 0
+        self._loop = None
+        self._server = None
+
+    async def _handle(self, ws):
+        text = ""
+        conversation = set()
+        try:
+            async for message in ws:
+                event = json.loads(message)
+                if event["type"] == "conversation.item.create":
+                    text = "".join(part.get("text", "") for part in event["item"]["content"])
+                    conversation.add(event["item"].get("id"))
+                    await ws.send(json.dumps({"type": "conversation.item.created", "item": event["item"]}))
+                elif event["type"] == "conversation.item.delete":
+                    conversation.discard(event["item_id"])
+                    await ws.send(json.dumps({"type": "conversation.item.deleted", "item_id": event["item_id"]}))
+                elif event["type"] == "response.create":
+                    self.utterances += 1
+                    reply = f"reply_{self.utterances}"
+                    conversation.add(reply)
+                    await self._speak(ws, text, reply)
+        except websockets.ConnectionClosed:
+            # Pooled sessions are dropped without a close frame when a benchmark process exits
+            pass
+
+    async def _speak(self, ws, text: str, item_id: str):
+        delta = b"\x00\x01" * (SAMPLE_RATE * self.delta_ms // 1000)
+        deltas = max(1, int(len(text) / self.chars_per_sec * 1000 / self.delta_ms))
+        await ws.send(json.dumps({"type": "response.output_item.added", "item": {"id": item_id}}))
+        for _ in range(deltas):
+            await ws.send(json.dumps({"type": "response.output_audio.delta", "item_id": item_id,
+                                      "delta": base64.b64encode(delta).decode()}))
+            await asyncio.sleep(self.delta_ms / 1000 / self.speedup)
+        await ws.send(json.dumps({"type": "response.output_audio.done"}))
+        await ws.send(json.dumps({"type": "response.done"}))
+
+    def start(self):
+        started = threading.Event()
+
+        async def serve():
+            self._server = await websockets.serve(self._handle, "127.0.0.1", 0)
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            await self._server.wait_closed()
+
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_until_complete, args=(serve(),), name="fake-realtime",
+                         daemon=True).start()
+        started.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._server.close)
+
+    def env(self) -> dict:
+        return {"XAI_REALTIME_URL": f"ws://127.0.0.1:{self.port}/v1/realtime"}
+
+
+def render_clip(path: str, seconds: int):
+    subprocess.run([
+        'ffmpeg', '-f', 'lavfi', '-i', f'testsrc=duration={seconds}:size=320x180:rate=24',
+        '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-y', path
+    ], check=True, capture_output=True)
+
+
+class FakeVideoServer:
+    """Video generation API: jobs become ready after ~latency seconds (+/- jitter) or fail at failure_rate."""
+
+    def __init__(self, latency: float = 3.0, jitter: float = 0.3, failure_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.jobs = {}  # request_id -> (ready_at, duration, failed)
+        self.submitted = 0
+        self.status_checks = 0
+        self._clips = {}
+        self._clip_dir = tempfile.mkdtemp(prefix="fake_clips_")
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    def clip(self, seconds: int) -> str:
+        with self._lock:
+            if seconds not in self._clips:
+                path = os.path.join(self._clip_dir, f"{seconds}.mp4")
+                render_clip(path, seconds)
+                self._clips[seconds] = path
+            return self._clips[seconds]
+
+    def clip_url(self, seconds: int) -> str:
+        return f"http://127.0.0.1:{self.port}/clips/{seconds}.mp4"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, body: dict, status: int = 200):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.rstrip("/") != "/v1/videos/generations":
+                    return self._json({"error": "not found"}, 404)
+                request_id = uuid.uuid4().hex
+                ready_at = time.monotonic() + max(0.0, random.gauss(fake.latency, fake.latency * fake.jitter))
+                failed = random.random() < fake.failure_rate
+                with fake._lock:
+                    fake.jobs[request_id] = (ready_at, int(payload.get("duration") or 5), failed)
+                    fake.submitted += 1
+                self._json({"request_id": request_id})
+
+            def do_GET(self):
+                if self.path.startswith("/clips/"):
+                    path = fake.clip(int(self.path[len("/clips/"):].split(".")[0]))
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "video/mp4")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                match = re.fullmatch(r"/v1/videos/(\w+)", self.path)
+                job = fake.jobs.get(match.group(1)) if match else None
+                if job is None:
+                    return self._json({"error": "not found"}, 404)
+                with fake._lock:
+                    fake.status_checks += 1
+                ready_at, duration, failed = job
+                if time.monotonic() < ready_at:
+                    return self._json({"status": "pending"})
+                if failed:
+                    return self._json({"status": "failed", "error": "fake render failure"})
+                self._json({"video": {"url": fake.clip_url(duration)}})
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-video", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def env(self) -> dict:
+        return {"XAI_VIDEO_API_URL": f"http://127.0.0.1:{self.port}/v1"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens-per-sec", type=float, default=200)
+    parser.add_argument("--video-latency", type=float, default=3.0)
+    parser.add_argument("--video-failure-rate", type=float, default=0.0)
+    parser.add_argument("--tts-speedup", type=float, default=10)
+    args = parser.parse_args()
+
+    fakes = [
+        FakeChatServer(tokens_per_sec=args.tokens_per_sec).start(),
+        FakeRealtimeServer(speedup=args.tts_speedup).start(),
+        FakeVideoServer(latency=args.video_latency, failure_rate=args.video_failure_rate).start(),
+    ]
+    print("Fake xAI APIs are up. Start the backend with:\n")
+    for fake in fakes:
+        for name, value in fake.env().items():
+            print(f"  export {name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for fake in fakes:
+            fake.stop()
+
+
+if __name__ == "__main__":
+    main()
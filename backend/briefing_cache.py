@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Seconds a finished briefing stays fresh (0 disables the cache)
+BRIEFING_CACHE_TTL = float(os.getenv("BRIEFING_CACHE_TTL", "300"))
+# Maximum number of briefings kept in memory (least recently used are dropped)
+BRIEFING_CACHE_SIZE = int(os.getenv("BRIEFING_CACHE_SIZE", "128"))
+
+
+def _normalize(text) -> str:
+    """Lowercase and collapse whitespace so trivially different inputs share a key."""
+    return " ".join(str(text or "").split()).lower()
+
+
+def make_key(topic, location="worldwide", generate_audio=True, generate_video=False, audio_format=None) -> tuple:
+    """Build the cache key for a briefing request."""
+    return (
+        _normalize(topic),
+        _normalize(location) or "worldwide",
+        bool(generate_audio),
+        bool(generate_video),
+        _normalize(audio_format) if generate_audio else "",
+    )
+
+
+class BriefingCache:
+    """Thread-safe TTL + LRU cache of finished briefings.
+
+    Values are dicts with the briefing JSON under "content" plus the
+    "audio_url" / "video_url" that were produced for it.
+    """
+
+    def __init__(self, ttl: float = BRIEFING_CACHE_TTL, max_entries: int = BRIEFING_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries if full."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Drop one entry, or everything when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose value matches predicate (e.g. it points at an evicted file)."""
+        with self._lock:
+            for key in [k for k, (_, value) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def is_cacheable(content: str, audio_url: str, video_url: str, generate_audio: bool, generate_video: bool) -> bool:
+    """Only cache complete briefings, so a failed audio/video step gets retried next time."""
+    try:
+        json.loads(content)
+    except (TypeError, ValueError):
+        return False
+    if generate_audio and not audio_url:
+        return False
+    if generate_video and not video_url:
+        return False
+    return True
+
+
+briefing_cache = BriefingCache()
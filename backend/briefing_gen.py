@@ -0,0 +1,427 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import contextvars
+import threading
+import traceback
+from contextlib import closing
+from dotenv import load_dotenv
+from xai_sdk import Client
+from xai_sdk.chat import user
+from xai_sdk.tools import x_search
+
+from script_gen import stream_script, SCRIPT_FIELDS
+from audio_gen import generate_audio
+from video_gen import generate_and_combine_videos
+from hls import HLSPlaylist, VIDEO_HLS_ENABLED
+from briefing_cache import briefing_cache, make_key, is_cacheable
+from stages import StageGraph
+from stream_json import StreamingJSONParser
+from singleflight import Flight
+from scheduler import BATCH, bind_owner, scheduled_iter
+from metrics import span, record, start_trace
+
+load_dotenv()
+
+client = Client(api_key=os.getenv("XAI_API_KEY"), api_host=os.getenv("XAI_API_HOST", "api.x.ai"))
+
+# Start the podcast script as soon as the fields it needs have streamed in (0 waits for the whole briefing)
+SCRIPT_SPECULATION = os.getenv("SCRIPT_SPECULATION", "1") != "0"
+
+# The server's event loop, bound at startup so pipeline threads can schedule coroutines on it
+main_loop = None
+
+
+def bind_event_loop(loop):
+    global main_loop
+    main_loop = loop
+
+
+def run_on_main_loop(coro):
+    """Run a coroutine on the server's event loop from a worker thread and wait for its result."""
+    if main_loop is None or not main_loop.is_running():
+        return asyncio.run(coro)
+    return asyncio.run_coroutine_threadsafe(coro, main_loop).result()
+
+
+def keep_media_item(item) -> bool:
+    """False for videos hosted on X, which can't be embedded."""
+    if not isinstance(item, dict) or item.get("type") != "video":
+        return True
+    url = item.get("url", "").lower()
+    source_url = item.get("sourceUrl", "").lower()
+
+    # Skip X video URLs - check both url and sourceUrl
+    is_x_video = (
+        "video.twimg.com" in url or
+        "x.com" in url or
+        "twitter.com" in url or
+        "twimg.com/tweet" in url or
+        "pbs.twimg.com/amplify" in url or
+        "x.com" in source_url or
+        "twitter.com" in source_url
+    )
+    return not is_x_video
+
+
+def filter_x_videos(content: str) -> str:
+    """Remove X video URLs from the response JSON."""
+    try:
+        data = json.loads(content)
+        if "media" in data and isinstance(data["media"], list):
+            data["media"] = [item for item in data["media"] if keep_media_item(item)]
+        return json.dumps(data)
+    except Exception as e:
+        return content
+
+
+def script_inputs(briefing_json: dict) -> dict:
+    return {field: briefing_json.get(field) for field in SCRIPT_FIELDS}
+
+
+def start_script(info: dict, cancelled: threading.Event = None) -> Flight:
+    """Stream the podcast script in a background thread, publishing each segment as soon as it is complete.
+
+    Audio and video stages subscribe to the returned Flight and start work on
+    the first segment while the rest of the script is still being written.
+    """
+    segments = Flight("script")
+    # Carry the briefing's scheduler identity into the script thread
+    ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(stream_into, segments, info, cancelled), name="script", daemon=True).start()
+    return segments
+
+
+def stream_into(segments: Flight, info: dict, cancelled: threading.Event = None):
+    error = None
+    script_start = time.perf_counter()
+    try:
+        with span("script") as script, closing(stream_script(info)) as stream:
+            script["segments"] = 0
+            for segment in stream:
+                if cancelled is not None and cancelled.is_set():
+                    print("🛑 Script generation cancelled")
+                    script["cancelled"] = True
+                    break
+                if not script["segments"]:
+                    record("script_first_segment", time.perf_counter() - script_start, script_start)
+                script["segments"] += 1
+                segments.publish(segment)
+    except Exception as e:
+        traceback.print_exc()
+        error = e
+    finally:
+        segments.finish(error)
+
+
+def script_segments(segments: Flight):
+    """Yield script segments as they are published; raises if the script failed."""
+    yield from segments.subscribe()
+    if segments.error is not None:
+        raise RuntimeError(f"Script generation failed: {segments.error}")
+
+
+async def script_segments_async(segments: Flight):
+    async for segment in segments.subscribe_async():
+        yield segment
+    if segments.error is not None:
+        raise RuntimeError(f"Script generation failed: {segments.error}")
+
+
+def wait_for_script(segments: Flight) -> bool:
+    """Block until the script has its first segment (True) or ended without any (False)."""
+    for _ in script_segments(segments):
+        return True
+    return False
+
+
+class SpeculativeScript:
+    """Script generation started while the search stream is still producing sources and media.
+
+    It is launched from the fields the script prompt reads as soon as they are
+    final in the stream. Its segments are used only if the finished briefing
+    still has the same values; otherwise it is cancelled and the script is
+    generated again.
+    """
+
+    def __init__(self):
+        self.inputs = None
+        self.segments = None
+        self._cancelled = threading.Event()
+
+    def maybe_start(self, parser: StreamingJSONParser) -> bool:
+        """Start generating once every script field is final. Returns True when it starts."""
+        if self.segments is not None or not parser.finished.issuperset(SCRIPT_FIELDS):
+            return False
+        self.inputs = script_inputs(parser.document)
+        self.segments = start_script(self.inputs, self._cancelled)
+        return True
+
+    def cancel(self):
+        """Stop the script at its next segment; used when the briefing it was drafted for failed."""
+        if self.segments is not None and not self._cancelled.is_set():
+            self._cancelled.set()
+            print("🛑 Briefing failed; cancelling the speculative script")
+
+    def segments_for(self, briefing_json: dict):
+        """The speculative script's segments if they were built from briefing_json's values, else None."""
+        if self.segments is None:
+            return None
+        if script_inputs(briefing_json) != self.inputs:
+            self._cancelled.set()
+            print("🔁 Briefing changed after the script was started; regenerating it")
+            return None
+        if self.segments.done and self.segments.error is not None:
+            print(f"⚠️  Speculative script failed, regenerating: {self.segments.error}")
+            return None
+        return self.segments
+
+
+def run_briefing(topic: str, location: str, enable_audio: bool, enable_video: bool, audio_format: str = None,
+                 priority: int = BATCH):
+    """Run the full briefing pipeline, yielding WebSocket-style event dicts.
+
+    Every xAI call made on behalf of this briefing is queued in the API
+    scheduler under its cache key at the given priority.
+    """
+    speculative_script = SpeculativeScript() if SCRIPT_SPECULATION and (enable_audio or enable_video) else None
+    try:
+        yield from briefing_events(topic, location, enable_audio, enable_video, audio_format, priority,
+                                   speculative_script)
+    except BaseException:
+        # The briefing is dead (or its consumer went away): stop paying for a script nobody will use
+        if speculative_script:
+            speculative_script.cancel()
+        raise
+
+
+def briefing_events(topic: str, location: str, enable_audio: bool, enable_video: bool, audio_format: str,
+                    priority: int, speculative_script: SpeculativeScript = None):
+    cache_key = make_key(topic, location, enable_audio, enable_video, audio_format)
+    bind_owner(cache_key, priority)
+    trace = start_trace()
+    yield {"type": "status", "content": f"Starting briefing generation for '{topic}' ({location})...\n"}
+
+    chat = client.chat.create(
+        model="grok-4-1-fast",
+        tools=[x_search(enable_image_understanding=True, enable_video_understanding=True)],
+        include=["verbose_streaming"],
+    )
+
+    # Immediately send a status to confirm connection is working
+    yield {"type": "status", "content": "Connected to Grok AI...\n"}
+
+    prompt_text = f"""You are a news analyst covering news from {location}. Search X for images about {location}. Return ONLY valid JSON with this structure:
+{{
+  "headline": "engaging title",
+  "summary": "2-3 sentence overview",
+    "confirmed_facts": [{{"text": "fact1", "sourceUrl": "https://x.com/user/status/id"}}, {{"text": "fact2", "sourceUrl": "https://x.com/user/status/id"}}],
+  "unconfirmed_claims": ["claim1", "claim2"],
+  "recent_changes": ["update1"],
+  "watch_next": ["related_topic1", "related_topic2"],
+  "sources": [
+    {{
+      "account_handle": "@username",
+      "display_name": "Full Name",
+      "excerpt": "quote or key statement",
+      "time_ago": "2h ago",
+      "post_url": "https://x.com/user/status/id",
+      "profile_image_url": "https://pbs.twimg.com/profile_images/...",
+      "label": "official|journalist|eyewitness|other"
+    }}
+  ],
+  "media": [
+    {{\"url": "image URL from X post (pbs.twimg.com only)", "type": "image", "caption": "relevant caption", "sourceUrl": "https://x.com/user/status/id"}}
+  ]
+}}
+CRITICAL: Include ONLY 2-3 images from X about {location} (pbs.twimg.com URLs). Do NOT include any videos in the response. Return images only."""
+    chat.append(user(prompt_text))
+    chat.append(user(f"Generate a news briefing for: {topic}"))
+
+    # Stream briefing generation
+    content = ""
+    # Parses the briefing as it streams: each field and list item is sent as soon as it is complete
+    parser = StreamingJSONParser(item_filters={"media": keep_media_item})
+    thinking_emitted = False
+    tool_searches = set()
+    search_start = time.perf_counter()
+    first_token = True
+    parse_seconds = 0.0
+    chunks = 0
+
+    for response, chunk in scheduled_iter("chat", chat.stream):
+        if first_token:
+            first_token = False
+            record("search_first_token", time.perf_counter() - search_start, search_start)
+        has_reasoning = getattr(response, "usage", None) and getattr(response.usage, "reasoning_tokens", None)
+        has_content = bool(chunk.content)
+
+        if has_reasoning and not thinking_emitted:
+            thinking_emitted = True
+            yield {
+                "type": "thinking",
+                "content": f"\n✨ Researching '{topic}' in {location}. Analyzing current events, finding relevant images, and compiling sources...\n"
+            }
+
+        for tool_call in chunk.tool_calls:
+            tool_name = tool_call.function.name
+            if tool_name not in tool_searches:
+                tool_searches.add(tool_name)
+                # Show tool details in human-readable format
+                try:
+                    args = json.loads(tool_call.function.arguments) if isinstance(tool_call.function.arguments, str) else tool_call.function.arguments
+                    if isinstance(args, dict):
+                        query = args.get("query", args.get("q", ""))
+                        if query:
+                            display_query = query[:60] + "..." if len(query) > 60 else query
+
+                            if "semantic" in tool_name:
+                                yield {
+                                    "type": "tool",
+                                    "content": f"Finding sources discussing: {display_query}\n"
+                                }
+                            elif "keyword" in tool_name:
+                                yield {
+                                    "type": "tool",
+                                    "content": f"Searching for keywords: {display_query}\n"
+                                }
+                            else:
+                                yield {
+                                    "type": "tool",
+                                    "content": f"Searching X for images: {display_query}\n"
+                                }
+                        else:
+                            yield {
+                                "type": "tool",
+                                "content": f"Gathering current information and visuals...\n"
+                            }
+                    else:
+                        yield {"type": "tool", "content": f"⚙️ Processing information...\n"}
+                except Exception as e:
+                    yield {
+                        "type": "tool",
+                        "content": f"🔄 Processing information...\n"
+                    }
+
+        if has_content:
+            content += chunk.content
+            yield {
+                "type": "chunk",
+                "content": chunk.content
+            }
+            chunks += 1
+            parse_start = time.perf_counter()
+            events = parser.feed(chunk.content)
+            parse_seconds += time.perf_counter() - parse_start
+            yield from events
+            if speculative_script and speculative_script.maybe_start(parser):
+                yield {"type": "status", "content": "🎙️ Drafting podcast script while sources are gathered...\n"}
+
+    record("search", time.perf_counter() - search_start, search_start, chunks=chunks)
+    record("parse", parse_seconds, chunks=chunks)
+
+    # X videos were already dropped by the parser; fall back to a full parse if the stream wasn't one clean object
+    briefing_json = parser.result()
+    if briefing_json is not None:
+        filtered_content = json.dumps(briefing_json)
+    else:
+        filtered_content = filter_x_videos(content)
+
+    audio_url = ""
+    video_url = ""
+    if enable_audio or enable_video:
+        if briefing_json is None:
+            try:
+                briefing_json = json.loads(filtered_content)
+            except json.JSONDecodeError:
+                traceback.print_exc()
+                if speculative_script:
+                    speculative_script.cancel()
+
+        if briefing_json is not None:
+            # Script once, streamed: TTS and video each pick up every segment as soon as it is written
+            segments = speculative_script.segments_for(briefing_json) if speculative_script else None
+            if segments is None:
+                yield {"type": "status", "content": "🎙️ Generating podcast script...\n"}
+                segments = start_script(briefing_json)
+            graph = StageGraph()
+            if enable_audio:
+                graph.add("audio", lambda deps, emit: audio_stage(segments, emit, audio_format))
+            if enable_video:
+                graph.add("video", lambda deps, emit: video_stage(segments, emit))
+            yield from graph.run()
+
+            audio_url = graph.results.get("audio") or ""
+            video_url = graph.results.get("video") or ""
+            if audio_url:
+                briefing_json["audio_url"] = audio_url
+            if video_url:
+                briefing_json["video_url"] = video_url
+            filtered_content = json.dumps(briefing_json)
+
+    if is_cacheable(filtered_content, audio_url, video_url, enable_audio, enable_video):
+        briefing_cache.put(cache_key, {"content": filtered_content, "audio_url": audio_url, "video_url": video_url})
+
+    record("briefing", trace.elapsed(), trace.started)
+    # Where the time went; only forwarded to WebSocket clients that asked for it
+    yield {"type": "timings", **trace.summary()}
+
+    # Send final briefing result (now potentially including audio_url / video_url)
+    yield {"type": "result", "content": filtered_content}
+
+
+def audio_stage(segments: Flight, emit, audio_format: str = None) -> str:
+    if not wait_for_script(segments):
+        return ""
+    emit({"type": "status", "content": "🎵 Generating audio (this may take a minute)...\n"})
+    filename = f"podcast_{uuid.uuid4().hex}.wav"
+    # generate_audio is async; run it on the server loop alongside the other sockets.
+    # The progressive URL is announced as soon as the wav is open, so players can start early.
+    with span("audio"):
+        audio_path = run_on_main_loop(generate_audio(
+            script_segments_async(segments),
+            filename,
+            on_stream_start=lambda path: emit({"type": "audio_stream", "url": f"http://localhost:8000{path}"}),
+            codec=audio_format,
+        ))
+    return f"http://localhost:8000{audio_path}"
+
+
+def video_stage(segments: Flight, emit) -> str:
+    if not wait_for_script(segments):
+        return ""
+    emit({"type": "status", "content": "🎬 Generating video segments (this will take a few minutes)...\n"})
+    try:
+        # Clips are downloaded as each one finishes, so combining starts right after the last lands
+        stem = f"briefing_{uuid.uuid4().hex}"
+        final_video_filename = f"{stem}.mp4"
+        playlist = None
+        if VIDEO_HLS_ENABLED:
+            # Announce each clip as it becomes playable, ahead of the combined mp4
+            playlist = HLSPlaylist("videos", stem, on_publish=lambda index, filename, duration: emit({
+                "type": "video_segment",
+                "index": index,
+                "url": f"http://localhost:8000/videos/{filename}",
+                "playlist": f"http://localhost:8000/videos/{stem}.m3u8",
+                "duration": duration,
+            }))
+        with span("video"):
+            final_video_path = generate_and_combine_videos(
+                script_segments(segments),
+                output_filename=final_video_filename,
+                on_generated=lambda: emit({"type": "status", "content": "🎞️ Combining video segments...\n"}),
+                playlist=playlist,
+            )
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        emit({"type": "status", "content": "⚠️ Video generation failed, skipping.\n"})
+        return ""
+
+    if not final_video_path:
+        return ""
+    video_url = f"http://localhost:8000/videos/{final_video_filename}"
+    emit({"type": "video_ready", "url": video_url})
+    return video_url
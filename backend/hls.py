@@ -0,0 +1,117 @@
+import math
+import os
+import subprocess
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Publish an HLS playlist that grows as video segments finish (0 only delivers the final mp4)
+VIDEO_HLS_ENABLED = os.getenv("VIDEO_HLS_ENABLED", "1") != "0"
+
+
+def remux_to_ts(src: str, dst: str):
+    """Repackage an mp4 clip as an MPEG-TS segment, re-encoding only if a stream copy fails."""
+    try:
+        subprocess.run([
+            'ffmpeg', '-i', src,
+            '-c', 'copy',
+            '-bsf:v', 'h264_mp4toannexb',
+            '-f', 'mpegts', '-y', dst
+        ], check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError:
+        subprocess.run([
+            'ffmpeg', '-i', src,
+            '-c:v', 'libx264', '-c:a', 'aac',
+            '-f', 'mpegts', '-y', dst
+        ], check=True, capture_output=True, text=True)
+
+
+class HLSPlaylist:
+    """EVENT-type HLS playlist for one briefing video, written next to the final mp4.
+
+    Segments may become ready in any order; each is appended only once every
+    earlier segment has been appended or skipped, so the playlist always
+    plays in script order. on_publish(index, filename, duration) is called for
+    every appended segment. The playlist is rewritten atomically on each
+    change so players polling it never see a partial file.
+    """
+
+    def __init__(self, directory: str, stem: str, count: int = None, on_publish=None):
+        self.directory = directory
+        self.stem = stem
+        self.count = count
+        self.on_publish = on_publish
+        self.filename = f"{stem}.m3u8"
+        self.path = os.path.join(directory, self.filename)
+        self._ready = {}  # index -> (filename, duration), or None if the segment was skipped
+        self._next = 0
+        self._published = []
+        self._ended = False
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{self.stem}_{index + 1:02d}.ts")
+
+    def add(self, index: int, duration: float):
+        """Mark segment index (already written to segment_path) as ready to play."""
+        with self._lock:
+            self._ready[index] = (os.path.basename(self.segment_path(index)), duration)
+            self._advance()
+
+    def skip(self, index: int):
+        """Mark segment index as failed so later segments are not held back by it."""
+        with self._lock:
+            self._ready[index] = None
+            self._advance()
+
+    def finish(self, count: int = None):
+        """Close the playlist; segments that never arrived are left out.
+
+        count is the final number of segments, if it was not known up front (e.g. a streamed script).
+        """
+        with self._lock:
+            if count is not None:
+                self.count = count
+            self._ended = True
+            for index in range(self._next, self.count or 0):
+                self._ready.setdefault(index, None)
+            self._advance(force_write=True)
+
+    def _advance(self, force_write: bool = False):
+        published = []
+        while self._next in self._ready:
+            entry = self._ready.pop(self._next)
+            if entry is not None:
+                self._published.append(entry)
+                published.append((self._next, *entry))
+            self._next += 1
+        if published or force_write:
+            self._write()
+        if self.on_publish:
+            for index, filename, duration in published:
+                self.on_publish(index, filename, duration)
+
+    def _write(self):
+        target = max((duration for _, duration in self._published), default=1)
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{math.ceil(target)}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for i, (filename, duration) in enumerate(self._published):
+            if i:
+                # Each clip is encoded separately, so timestamps restart at every segment
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(filename)
+        if self._ended:
+            lines.append("#EXT-X-ENDLIST")
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.path)
@@ -0,0 +1,298 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+# Finished jobs and their event logs are kept this long (seconds)
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
+# Processes refresh the heartbeat of the jobs they run this often; a running job whose
+# heartbeat is older than JOB_LEASE is considered orphaned (its process died)
+JOB_HEARTBEAT = float(os.getenv("JOB_HEARTBEAT", "5"))
+JOB_LEASE = float(os.getenv("JOB_LEASE", "30"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Which pipeline stage an event type belongs to, for job listings
+STAGE_EVENTS = {
+    "thinking": "search",
+    "tool": "search",
+    "chunk": "search",
+    "field": "search",
+    "item": "search",
+    "audio_stream": "audio",
+    "video_segment": "video",
+    "video_ready": "video",
+    "result": "done",
+    "error": "failed",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    cache_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    params TEXT,
+    priority INTEGER NOT NULL DEFAULT 1,
+    worker TEXT,
+    heartbeat_at REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_cache_key ON jobs (cache_key, updated_at);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, created_at);
+"""
+
+# Columns added after the first version of the schema
+MIGRATIONS = {
+    "params": "TEXT",
+    "priority": "INTEGER NOT NULL DEFAULT 1",
+    "worker": "TEXT",
+    "heartbeat_at": "REAL",
+}
+
+
+class JobStore:
+    """SQLite-backed queue and log of briefing jobs and every event they emitted.
+
+    Each briefing gets a job id; its events are appended with their sequence
+    number before they are published, so a client that reconnects with
+    (job id, offset) can always be replayed whatever it missed, even after
+    the producer has finished or the server has restarted.
+
+    The database is shared by every process on the host: the web tier can
+    enqueue jobs that worker processes claim (see worker.py), and anyone can
+    read a job's log. Each process heartbeats the jobs it is running; jobs
+    whose process stopped heartbeating are closed as interrupted.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH, retention: float = JOB_RETENTION, lease: float = JOB_LEASE):
+        self.path = path
+        self.retention = retention
+        self.lease = lease
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, definition in MIGRATIONS.items():
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        self._db.executescript(INDEXES)
+        self._next_seq = {}  # job_id -> next seq, for jobs running in this process
+        self._heartbeat = None
+        self.recover()
+        self.prune()
+
+    def _own(self, job_id: str):
+        """Track a job run by this process and make sure its heartbeat is being refreshed."""
+        self._next_seq[job_id] = 0
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT)
+            with self._lock:
+                job_ids = list(self._next_seq)
+                if job_ids:
+                    self._db.executemany("UPDATE jobs SET heartbeat_at = ? WHERE id = ?",
+                                         [(time.time(), job_id) for job_id in job_ids])
+
+    def start(self, cache_key, job_id: str = None) -> str:
+        """Register a new job for cache_key that this process runs itself, and return its id."""
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, cache_key, status, stage, created_at, updated_at, worker, heartbeat_at)"
+                " VALUES (?, ?, 'running', 'queued', ?, ?, ?, ?)",
+                (job_id, json.dumps(cache_key), now, now, self.worker_id, now),
+            )
+            self._own(job_id)
+        return job_id
+
+    def enqueue(self, cache_key, params: dict, priority: int = 1):
+        """Queue a job for a worker process. Returns (job_id, created).
+
+        If an identical job (same cache_key) is already queued or running on
+        any process, its id is returned instead so callers share it.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE cache_key = ? AND status IN (?, ?) ORDER BY created_at DESC LIMIT 1",
+                    (json.dumps(cache_key), *ACTIVE_STATUSES),
+                ).fetchone()
+                if row:
+                    self._db.execute("COMMIT")
+                    return row[0], False
+                job_id = uuid.uuid4().hex
+                self._db.execute(
+                    "INSERT INTO jobs (id, cache_key, status, stage, created_at, updated_at, params, priority)"
+                    " VALUES (?, ?, 'queued', 'queued', ?, ?, ?, ?)",
+                    (job_id, json.dumps(cache_key), now, now, json.dumps(params), priority),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return job_id, True
+
+    def claim(self, worker_id: str = None):
+        """Atomically take the most urgent queued job. Returns {"jobId", "params", "priority"} or None."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, params, priority FROM jobs WHERE status = 'queued' ORDER BY priority, created_at LIMIT 1"
+                ).fetchone()
+                if row:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                        (worker_id or self.worker_id, now, now, row[0]),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            if row is None:
+                return None
+            self._own(row[0])
+        return {"jobId": row[0], "params": json.loads(row[1] or "{}"), "priority": row[2]}
+
+    def append(self, job_id: str, event: dict) -> dict:
+        """Store event (stamping the next seq if it has none) and return it as stored."""
+        stage = STAGE_EVENTS.get(event.get("type"))
+        with self._lock:
+            if "seq" not in event:
+                event = {**event, "seq": self._next_seq.get(job_id, 0)}
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("INSERT OR REPLACE INTO events (job_id, seq, event) VALUES (?, ?, ?)",
+                                 (job_id, event["seq"], json.dumps(event)))
+                if stage:
+                    self._db.execute("UPDATE jobs SET stage = ?, updated_at = ? WHERE id = ?",
+                                     (stage, time.time(), job_id))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._next_seq[job_id] = event["seq"] + 1
+        return event
+
+    def finish(self, job_id: str):
+        """Close a job; it counts as failed if its last stored event was an error."""
+        with self._lock:
+            self._next_seq.pop(job_id, None)
+            row = self._db.execute("SELECT stage FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            status = "failed" if row and row[0] == "failed" else "done"
+            self._db.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, cache_key, status, stage, created_at, updated_at,"
+                " (SELECT COUNT(*) FROM events WHERE job_id = jobs.id), worker FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "jobId": row[0],
+            "key": json.loads(row[1]),
+            "status": row[2],
+            "stage": row[3],
+            "created_at": row[4],
+            "updated_at": row[5],
+            "events": row[6],
+            "worker": row[7],
+        }
+
+    def events(self, job_id: str, start: int = 0) -> list:
+        """Stored events of job_id with seq >= start, in order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT event FROM events WHERE job_id = ? AND seq >= ? ORDER BY seq", (job_id, start)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def last_result(self, cache_key, max_age: float):
+        """The result event of the newest successful job for cache_key finished within max_age, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT e.event FROM jobs j JOIN events e ON e.job_id = j.id"
+                " WHERE j.cache_key = ? AND j.status = 'done' AND j.updated_at > ?"
+                " ORDER BY j.updated_at DESC, e.seq DESC LIMIT 1",
+                (json.dumps(cache_key), time.time() - max_age),
+            ).fetchone()
+        if row is None:
+            return None
+        event = json.loads(row[0])
+        return event if event.get("type") == "result" else None
+
+    def recover(self):
+        """Close running jobs whose process stopped heartbeating, so clients following them are told they ended."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, (SELECT COALESCE(MAX(seq) + 1, 0) FROM events WHERE job_id = jobs.id)"
+                " FROM jobs WHERE status = 'running' AND COALESCE(heartbeat_at, 0) < ?",
+                (time.time() - self.lease,),
+            ).fetchall()
+        for job_id, seq in rows:
+            if job_id in self._next_seq:
+                continue
+            self.append(job_id, {"type": "error", "message": "Briefing was interrupted because its server process stopped", "seq": seq})
+            with self._lock:
+                self._next_seq.pop(job_id, None)
+                self._db.execute("UPDATE jobs SET status = 'interrupted', updated_at = ? WHERE id = ?", (time.time(), job_id))
+        if rows:
+            print(f"♻️  Marked {len(rows)} orphaned briefing job(s) as interrupted")
+
+    def prune(self) -> int:
+        """Delete finished jobs older than the retention period. Returns how many were removed."""
+        if self.retention <= 0:
+            return 0
+        cutoff = time.time() - self.retention
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "DELETE FROM events WHERE job_id IN"
+                " (SELECT id FROM jobs WHERE status NOT IN (?, ?) AND updated_at < ?)",
+                (*ACTIVE_STATUSES, cutoff),
+            )
+            removed = self._db.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated_at < ?", (*ACTIVE_STATUSES, cutoff)
+            ).rowcount
+            self._db.execute("COMMIT")
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"jobs": counts, "running_here": len(self._next_seq)}
+
+
+job_store = JobStore()
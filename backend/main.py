@@ -1,19 +1,32 @@
 import os
 import json
-import uuid
 import asyncio
+from contextlib import aclosing
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.websockets import WebSocketState
 from pydantic import BaseModel
+from typing import Optional
 from xai_sdk import Client
 from xai_sdk.chat import user
 from xai_sdk.tools import x_search
 
-from script_gen import generate_script as create_script_from_briefing  # Rename to avoid conflict
-from audio_gen import generate_audio
-from video_gen import generate_videos, combine_videos
+from briefing_gen import run_briefing, bind_event_loop
+from audio_gen import (
+    AUDIO_CODECS, active_writers, follow_wav, follow_wav_file, wav_in_progress, find_finished_audio, negotiate_codec,
+    can_encode, resolve_codec, read_file_chunks, transcode_stream,
+)
+from briefing_cache import briefing_cache, make_key, is_cacheable
+from tts_cache import tts_cache
+from video_cache import video_cache
+from video_gen import VIDEO_SCRATCH_DIR
+from artifact_store import ArtifactStore, TrackedStaticFiles, PinnedFileResponse, pinned_chunks, ARTIFACT_SWEEP_INTERVAL
+from singleflight import briefing_flights, job_tailer
+from job_store import job_store
+from scheduler import api_scheduler, scheduled_iter, INTERACTIVE, BATCH
+import metrics
 
 from concurrent.futures import ThreadPoolExecutor
 import threading
@@ -22,39 +35,6 @@ import sys
 
 load_dotenv()
 
-def filter_x_videos(content: str) -> str:
-    """Remove X video URLs from the response JSON."""
-    try:
-        data = json.loads(content)
-        if "media" in data and isinstance(data["media"], list):
-            # Filter out videos from X domains
-            filtered_media = []
-            for item in data["media"]:
-                if item.get("type") == "video":
-                    url = item.get("url", "").lower()
-                    source_url = item.get("sourceUrl", "").lower()
-                    
-                    # Skip X video URLs - check both url and sourceUrl
-                    is_x_video = (
-                        "video.twimg.com" in url or 
-                        "x.com" in url or 
-                        "twitter.com" in url or
-                        "twimg.com/tweet" in url or
-                        "pbs.twimg.com/amplify" in url or
-                        "x.com" in source_url or
-                        "twitter.com" in source_url
-                    )
-                    
-                    if is_x_video:
-                        continue
-                
-                filtered_media.append(item)
-            data["media"] = filtered_media
-        return json.dumps(data)
-    except Exception as e:
-        return content
-
-
 app = FastAPI()
 
 # Enable CORS for frontend
@@ -66,18 +46,110 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def forget_evicted(path: str):
+    """Drop cached briefings that point at an artifact the store just deleted."""
+    suffix = "/" + os.path.basename(path)
+    briefing_cache.invalidate_where(
+        lambda value: value["audio_url"].endswith(suffix) or value["video_url"].endswith(suffix)
+    )
+
+# Quota + LRU eviction for generated artifacts, plus cleanup of orphaned temp files
+artifact_store = ArtifactStore(["audio", "videos"], temp_directories=[VIDEO_SCRATCH_DIR], on_evict=forget_evicted)
+
 # Serve audio files
 if not os.path.exists("audio"):
     os.makedirs("audio")
-app.mount("/audio", StaticFiles(directory="audio"), name="audio")
+app.mount("/audio", TrackedStaticFiles(directory="audio", store=artifact_store), name="audio")
 
 # Serve video files
 if not os.path.exists("videos"):
     os.makedirs("videos")
-app.mount("/videos", StaticFiles(directory="videos"), name="videos")
+app.mount("/videos", TrackedStaticFiles(directory="videos", store=artifact_store), name="videos")
+
+client = Client(api_key=os.getenv("XAI_API_KEY"), api_host=os.getenv("XAI_API_HOST", "api.x.ai"))
+# Shared, bounded pool for blocking SDK calls made from request handlers
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("BLOCKING_IO_WORKERS", "4")))
+# "inline" runs briefings in this process; "workers" queues them for worker.py processes
+JOB_EXECUTION = os.getenv("JOB_EXECUTION", "inline")
+
+@app.on_event("startup")
+async def capture_main_loop():
+    # Lets pipeline threads run coroutines (e.g. audio generation) on the server loop
+    bind_event_loop(asyncio.get_running_loop())
+
+async def run_blocking(func, *args):
+    """Run a blocking call on the shared executor without stalling the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+async def sweep_artifacts_periodically():
+    while True:
+        try:
+            await run_blocking(artifact_store.sweep)
+            await run_blocking(job_store.prune)
+        except Exception as e:
+            print(f"❌ Artifact sweep failed: {e}")
+        await asyncio.sleep(ARTIFACT_SWEEP_INTERVAL)
+
+async def recover_jobs_periodically():
+    # A restarted inline server never hears from its dead predecessor again: close that
+    # process's jobs once their lease runs out so clients following them get an error event
+    while True:
+        await asyncio.sleep(job_store.lease)
+        try:
+            await run_blocking(job_store.recover)
+        except Exception as e:
+            print(f"❌ Job recovery failed: {e}")
+
+def artifact_exists(url: str) -> bool:
+    for directory in ("audio", "videos"):
+        if f"/{directory}/" in url:
+            return os.path.exists(os.path.join(directory, os.path.basename(url)))
+    return False
+
+def lookup_cached(cache_key):
+    """Cached briefing for cache_key, falling back to a recent job persisted by an earlier server process."""
+    cached = briefing_cache.get(cache_key)
+    if cached:
+        return cached
+    event = job_store.last_result(cache_key, briefing_cache.ttl)
+    if event is None:
+        return None
+    try:
+        briefing_json = json.loads(event["content"])
+    except (json.JSONDecodeError, TypeError):
+        return None
+    audio_url = briefing_json.get("audio_url", "")
+    video_url = briefing_json.get("video_url", "")
+    _, _, generate_audio, generate_video, _ = cache_key
+    if not is_cacheable(event["content"], audio_url, video_url, generate_audio, generate_video):
+        return None
+    if not all(artifact_exists(url) for url in (audio_url, video_url) if url):
+        return None
+    value = {"content": event["content"], "audio_url": audio_url, "video_url": video_url}
+    briefing_cache.put(cache_key, value)
+    return value
+
+async def start_briefing(cache_key, params: dict, priority: int):
+    """Attach to an identical in-progress briefing, or start one. Returns (flight, is_leader).
+
+    In workers mode the job is queued in the shared job store and this process
+    only tails its events; otherwise the pipeline runs in a local thread.
+    """
+    if JOB_EXECUTION == "workers":
+        job_id, created = await run_blocking(job_store.enqueue, cache_key, params, priority)
+        return job_tailer.follow(job_id), created
+    return briefing_flights.join(cache_key, lambda: run_briefing(**params, priority=priority))
+
+@app.on_event("startup")
+async def start_artifact_sweeper():
+    if ARTIFACT_SWEEP_INTERVAL > 0:
+        app.state.artifact_sweeper = asyncio.create_task(sweep_artifacts_periodically())
+
+@app.on_event("startup")
+async def start_job_recovery():
+    if job_store.lease > 0:
+        app.state.job_recovery = asyncio.create_task(recover_jobs_periodically())
 
-client = Client(api_key=os.getenv("XAI_API_KEY"))
-executor = ThreadPoolExecutor(max_workers=4)
 
 class VideoScriptRequest(BaseModel):
     topic: str
@@ -87,6 +159,7 @@ class VideoScriptResponse(BaseModel):
 
 class BriefingRequest(BaseModel):
     topic: str
+    audio_format: Optional[str] = None  # wav | mp3 | opus (defaults to AUDIO_CODEC)
 
 class BriefingResponse(BaseModel):
     script: str # This is the JSON string of the briefing
@@ -98,85 +171,56 @@ async def generate_briefing(request: BriefingRequest):
     if not os.getenv("XAI_API_KEY"):
         raise HTTPException(status_code=500, detail="XAI_API_KEY not configured")
     
+    audio_format = resolve_codec(request.audio_format)
+    cache_key = make_key(request.topic, "worldwide", generate_audio=True, generate_video=False, audio_format=audio_format)
+    cached = await run_blocking(lookup_cached, cache_key)
+    if cached:
+        print(f"⚡ Briefing cache hit for '{request.topic}'")
+        return BriefingResponse(script=cached["content"], audio_url=cached["audio_url"])
+
+    # Coalesce with any identical briefing already being generated
+    flight, is_leader = await start_briefing(cache_key, {
+        "topic": request.topic, "location": "worldwide", "enable_audio": True, "enable_video": False,
+        "audio_format": audio_format,
+    }, BATCH)
+    if not is_leader:
+        print(f"🔗 Joined in-flight briefing for '{request.topic}'")
+
+    content = None
+    async for event in flight.subscribe_async():
+        if event["type"] == "error":
+            raise HTTPException(status_code=500, detail=f"Error generating briefing: {event['message']}")
+        if event["type"] == "result":
+            content = event["content"]
+
     try:
-        # 1. Generate Briefing Content (JSON text)
-        # print(f"Step 1: Generating briefing for '{request.topic}'...")
-        chat = client.chat.create(
-            model="grok-4-1-fast",
-            tools=[x_search(enable_image_understanding=True, enable_video_understanding=True)],
-            include=["verbose_streaming"],
-        )
-        
-        # System prompt for briefing
-        prompt_text = """You are a news analyst. Search X for images about the topic. Return ONLY valid JSON with this structure:
-{
-  "headline": "engaging title",
-  "summary": "2-3 sentence overview",
-  "confirmed_facts": [{"text": "fact1", "sourceUrl": "https://x.com/user/status/id"}, {"text": "fact2", "sourceUrl": "https://x.com/user/status/id"}],
-  "unconfirmed_claims": ["claim1", "claim2"],
-  "recent_changes": ["update1"],
-  "watch_next": ["related_topic1", "related_topic2"],
-  "sources": [
-    {
-      "account_handle": "@username",
-      "display_name": "Full Name",
-      "excerpt": "quote or key statement",
-      "time_ago": "2h ago",
-      "post_url": "https://x.com/user/status/id",
-      "profile_image_url": "https://pbs.twimg.com/profile_images/...",
-      "label": "official|journalist|eyewitness|other"
-    }
-  ],
-  "media": [
-    {"url": "image URL from X post (pbs.twimg.com only)", "type": "image", "caption": "relevant caption", "sourceUrl": "https://x.com/user/status/id"}
-  ]
-}
-CRITICAL: Include ONLY 2-3 images from X (pbs.twimg.com URLs). Do NOT include any videos in the response. Return images only."""
-        chat.append(user(prompt_text))
-        chat.append(user(f"Generate a news briefing for: {request.topic}"))
-        
-        # Stream and collect response
-        content = ""
-        for response, chunk in chat.stream():
-            if chunk.content:
-                content += chunk.content
-
-        print(f"✓ Briefing generated: {len(content)} chars")
-
-        # Filter out invalid media
-        filtered_content = filter_x_videos(content)
-
-        # 2. Parse the briefing JSON
-        print("Step 2: Parsing briefing JSON...")
-        briefing_json = json.loads(filtered_content)
-        print("✓ Briefing JSON parsed successfully")
-        
-        # 3. Generate Script from Briefing
-        print("Step 3: Generating podcast script from briefing...")
-        script_segments = create_script_from_briefing(briefing_json)
-        print(f"✓ Generated {len(script_segments) if script_segments else 0} script segments")
-        
-        # 4. Generate Audio from Script
-        full_audio_url = ""
-        if script_segments:
-            print("Step 4: Generating audio from script...")
-            filename = f"podcast_{uuid.uuid4().hex}.wav"
-            audio_path = await generate_audio(script_segments, filename)
-            full_audio_url = f"http://localhost:8000{audio_path}"
-            print(f"✓ Audio generated: {full_audio_url}")
-        else:
-            print("⚠ No script segments - skipping audio generation")
-        
-        # 5. Return both briefing and audio
-        print("Step 5: Returning briefing + audio URL")
-        return BriefingResponse(script=filtered_content, audio_url=full_audio_url)
-        
+        briefing_json = json.loads(content or "")
     except json.JSONDecodeError as e:
         print(f"❌ JSON parsing error: {e}")
         raise HTTPException(status_code=500, detail=f"Invalid JSON in briefing: {str(e)}")
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Error generating briefing: {str(e)}")
+
+    return BriefingResponse(script=content, audio_url=briefing_json.get("audio_url", ""))
+
+
+def stream_video_script(topic: str) -> str:
+    """Blocking: research the topic on X and return the raw video script JSON."""
+    chat = client.chat.create(
+        model="grok-4-1-fast",
+        tools=[x_search(enable_image_understanding=True, enable_video_understanding=True)],
+        include=["verbose_streaming"],
+    )
+    
+    chat.append(
+        user("You are an expert video scriptwriter and researcher. Return ONLY valid JSON with this structure: {\"headline\": \"title\", \"summary\": \"2-3 sentence overview\", \"confirmed_facts\": [\"fact1\", \"fact2\", \"fact3\"], \"unconfirmed_claims\": [\"claim1\"], \"recent_changes\": [\"change1\"], \"watch_next\": [\"topic1\"], \"script\": \"full 2-5 minute video script\"}")
+    )
+    
+    chat.append(user(f"Generate content for topic: {topic}"))
+    
+    script_content = ""
+    for response, chunk in scheduled_iter("chat", chat.stream):
+        if chunk.content:
+            script_content += chunk.content
+    return script_content
 
 
 @app.post("/generate-script", response_model=VideoScriptResponse)
@@ -186,38 +230,73 @@ async def generate_script_endpoint(request: VideoScriptRequest):  # ✅ Renamed
         raise HTTPException(status_code=500, detail="XAI_API_KEY not configured")
     
     try:
-        chat = client.chat.create(
-            model="grok-4-1-fast",
-            tools=[x_search(enable_image_understanding=True, enable_video_understanding=True)],
-            include=["verbose_streaming"],
-        )
-        
-        chat.append(
-            user("You are an expert video scriptwriter and researcher. Return ONLY valid JSON with this structure: {\"headline\": \"title\", \"summary\": \"2-3 sentence overview\", \"confirmed_facts\": [\"fact1\", \"fact2\", \"fact3\"], \"unconfirmed_claims\": [\"claim1\"], \"recent_changes\": [\"change1\"], \"watch_next\": [\"topic1\"], \"script\": \"full 2-5 minute video script\"}")
-        )
-        
-        chat.append(user(f"Generate content for topic: {request.topic}"))
-        
-        script_content = ""
-        for response, chunk in chat.stream():
-            if chunk.content:
-                script_content += chunk.content
-        
+        # The SDK stream is blocking, so keep it off the event loop
+        script_content = await run_blocking(stream_video_script, request.topic)
         return VideoScriptResponse(script=script_content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating script: {str(e)}")
 
 
+async def forward_flight(websocket: WebSocket, flight, start: int = 0, timings: bool = False):
+    """Forward flight events from index start as the producer publishes them.
+
+    The subscriber sleeps on an asyncio.Event woken via call_soon_threadsafe,
+    so an idle socket costs no CPU and holds no thread or queue of its own.
+    The `timings` event is only sent if the client asked for it.
+    """
+    try:
+        async with aclosing(flight.subscribe_async(start)) as events:
+            async for message in events:
+                if websocket.client_state != WebSocketState.CONNECTED:
+                    break
+                if message.get("type") == "timings" and not timings:
+                    continue
+                with metrics.span("websocket_send"):
+                    await websocket.send_json(message)
+                if message.get("type") == "error":
+                    break
+    except Exception as send_err:
+        pass
+
+
+async def resume_job(websocket: WebSocket, job_id: str, offset: int, timings: bool = False):
+    """Reattach a reconnecting client to job_id, replaying events from seq offset onwards."""
+    flight = briefing_flights.find_job(job_id)
+    if flight is not None:
+        # Still running here: follow the live log, which holds every event since the start
+        await forward_flight(websocket, flight, offset, timings)
+    elif JOB_EXECUTION == "workers":
+        # Run by a worker process: the tailer replays the stored log and follows it until the job ends
+        await forward_flight(websocket, job_tailer.follow(job_id), offset, timings)
+    else:
+        # Finished (or from before a restart): replay the stored log without touching the upstream APIs
+        job = await run_blocking(job_store.get, job_id)
+        if job is None:
+            await websocket.send_json({"type": "error", "message": f"Unknown job '{job_id}'"})
+        else:
+            for event in await run_blocking(job_store.events, job_id, offset):
+                if event.get("type") != "timings" or timings:
+                    await websocket.send_json(event)
+    await websocket.close()
+
+
 @app.websocket("/ws/briefing")
 async def websocket_briefing(websocket: WebSocket):
     """Stream briefing generation chunks to the client in real time."""
     await websocket.accept()
     try:
         init_msg = await websocket.receive_json()
+        # Opt-in per-stage timing breakdown, sent just before the result
+        timings = bool(init_msg.get("timings")) if isinstance(init_msg, dict) else False
+        if isinstance(init_msg, dict) and init_msg.get("jobId"):
+            await resume_job(websocket, init_msg["jobId"], int(init_msg.get("offset") or 0), timings)
+            return
+
         topic = init_msg.get("topic") if isinstance(init_msg, dict) else None
         location = init_msg.get("location", "worldwide") if isinstance(init_msg, dict) else "worldwide"
         should_generate_audio = init_msg.get("generateAudio", True) if isinstance(init_msg, dict) else True
         should_generate_video = init_msg.get("generateVideo", False) if isinstance(init_msg, dict) else False
+        audio_format = resolve_codec(init_msg.get("audioFormat") if isinstance(init_msg, dict) else None)
 
         if not topic:
             await websocket.send_json({"type": "error", "message": "topic is required"})
@@ -229,244 +308,28 @@ async def websocket_briefing(websocket: WebSocket):
             await websocket.close()
             return
 
-        # Send status that we're starting generation
-        # (moved inside generator to maintain proper queue ordering)
-
-        def run_briefing(enable_audio, enable_video):
-            yield {"type": "status", "content": f"Starting briefing generation for '{topic}' ({location})...\n"}
-            
-            chat = client.chat.create(
-                model="grok-4-1-fast",
-                tools=[x_search(enable_image_understanding=True, enable_video_understanding=True)],
-                include=["verbose_streaming"],
-            )
-            
-            # Immediately send a status to confirm connection is working
-            yield {"type": "status", "content": "Connected to Grok AI...\n"}
-
-            prompt_text = f"""You are a news analyst covering news from {location}. Search X for images about {location}. Return ONLY valid JSON with this structure:
-{{
-  "headline": "engaging title",
-  "summary": "2-3 sentence overview",
-    "confirmed_facts": [{{"text": "fact1", "sourceUrl": "https://x.com/user/status/id"}}, {{"text": "fact2", "sourceUrl": "https://x.com/user/status/id"}}],
-  "unconfirmed_claims": ["claim1", "claim2"],
-  "recent_changes": ["update1"],
-  "watch_next": ["related_topic1", "related_topic2"],
-  "sources": [
-    {{
-      "account_handle": "@username",
-      "display_name": "Full Name",
-      "excerpt": "quote or key statement",
-      "time_ago": "2h ago",
-      "post_url": "https://x.com/user/status/id",
-      "profile_image_url": "https://pbs.twimg.com/profile_images/...",
-      "label": "official|journalist|eyewitness|other"
-    }}
-  ],
-  "media": [
-    {{\"url": "image URL from X post (pbs.twimg.com only)", "type": "image", "caption": "relevant caption", "sourceUrl": "https://x.com/user/status/id"}}
-  ]
-}}
-CRITICAL: Include ONLY 2-3 images from X about {location} (pbs.twimg.com URLs). Do NOT include any videos in the response. Return images only."""
-            chat.append(user(prompt_text))
-            chat.append(user(f"Generate a news briefing for: {topic}"))
-
-            # Stream briefing generation
-            content = ""
-            thinking_emitted = False
-            tool_searches = set()
-            
-            for response, chunk in chat.stream():
-                has_reasoning = getattr(response, "usage", None) and getattr(response.usage, "reasoning_tokens", None)
-                has_content = bool(chunk.content)
-                
-                if has_reasoning and not thinking_emitted:
-                    thinking_emitted = True
-                    yield {
-                        "type": "thinking",
-                        "content": f"\n✨ Researching '{topic}' in {location}. Analyzing current events, finding relevant images, and compiling sources...\n"
-                    }
-
-                for tool_call in chunk.tool_calls:
-                    tool_name = tool_call.function.name
-                    if tool_name not in tool_searches:
-                        tool_searches.add(tool_name)
-                        # Show tool details in human-readable format
-                        try:
-                            args = json.loads(tool_call.function.arguments) if isinstance(tool_call.function.arguments, str) else tool_call.function.arguments
-                            if isinstance(args, dict):
-                                query = args.get("query", args.get("q", ""))
-                                if query:
-                                    display_query = query[:60] + "..." if len(query) > 60 else query
-                                    
-                                    if "semantic" in tool_name:
-                                        yield {
-                                            "type": "tool",
-                                            "content": f"Finding sources discussing: {display_query}\n"
-                                        }
-                                    elif "keyword" in tool_name:
-                                        yield {
-                                            "type": "tool",
-                                            "content": f"Searching for keywords: {display_query}\n"
-                                        }
-                                    else:
-                                        yield {
-                                            "type": "tool",
-                                            "content": f"Searching X for images: {display_query}\n"
-                                        }
-                                else:
-                                    yield {
-                                        "type": "tool",
-                                        "content": f"Gathering current information and visuals...\n"
-                                    }
-                            else:
-                                yield {"type": "tool", "content": f"⚙️ Processing information...\n"}
-                        except Exception as e:
-                            yield {
-                                "type": "tool",
-                                "content": f"🔄 Processing information...\n"
-                            }
-
-                if has_content:
-                    content += chunk.content
-                    yield {
-                        "type": "chunk",
-                        "content": chunk.content
-                    }
-            
-            # Filter out X videos before sending result
-            filtered_content = filter_x_videos(content)
-            
-            # ✅ GENERATE AUDIO (if enabled)
-            audio_url = ""
-            try:
-                if enable_audio:
-                    yield {"type": "status", "content": "🎙️ Generating podcast script...\n"}
-                    
-                    briefing_json = json.loads(filtered_content)
-                    script_segments = create_script_from_briefing(briefing_json)
-                    
-                    if script_segments:
-                        yield {"type": "status", "content": "🎵 Generating audio (this may take a minute)...\n"}
-                        
-                        filename = f"podcast_{uuid.uuid4().hex}.wav"
-                        
-                        # Run async generate_audio in sync context
-                        import asyncio
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        audio_path = loop.run_until_complete(generate_audio(script_segments, filename))
-                        loop.close()
-                        
-                        audio_url = f"http://localhost:8000{audio_path}"
-                        
-                        # Inject audio_url into the briefing JSON
-                        briefing_json = json.loads(filtered_content)
-                        briefing_json["audio_url"] = audio_url
-                        filtered_content = json.dumps(briefing_json)
-                        
-            except Exception as e:
-                # Don't fail the whole request, just log and continue without audio
-                import traceback
-                traceback.print_exc()
-            
-            # ✅ GENERATE VIDEO (if enabled)
-            try:
-                if enable_video:
-                    briefing_json = json.loads(filtered_content)
-                    script_segments = create_script_from_briefing(briefing_json)
-                    
-                    if script_segments:
-                        yield {"type": "status", "content": "🎬 Generating video segments (this will take a few minutes)...\n"}
-                        
-                        try:
-                            # 1. Generate individual clips
-                            video_urls = generate_videos(script_segments)
-                            
-                            # 2. Combine them
-                            yield {"type": "status", "content": "🎞️ Combining video segments...\n"}
-                            final_video_filename = f"briefing_{uuid.uuid4().hex}.mp4"
-                            final_video_path = combine_videos(video_urls, output_filename=final_video_filename)
-                            
-                            if final_video_path:
-                                # Just use the filename we passed
-                                video_url = f"http://localhost:8000/videos/{final_video_filename}"
-                                briefing_json["video_url"] = video_url
-                                
-                                # Also emit a specific event for video ready if needed
-                                yield {"type": "video_ready", "url": video_url}
-                            
-                        except Exception as vid_err:
-                            import traceback
-                            traceback.print_exc()
-                            yield {"type": "status", "content": "⚠️ Video generation failed, skipping.\n"}
-
-                        # Update content with all URLs
-                        filtered_content = json.dumps(briefing_json)
-                    
-            except Exception as e:
-                # Don't fail the whole request, just log and continue without video
-                import traceback
-                traceback.print_exc()
-                    
-            except Exception as e:
-                # Don't fail the whole request, just log and continue without audio
-                import traceback
-                traceback.print_exc()
-
-            # Send final briefing result (now potentially including audio_url)
-            yield {"type": "result", "content": filtered_content}
-
-        # Run in thread and stream to WebSocket
-        from queue import Queue
-        import queue
-        import threading
-        
-        message_queue = Queue()
-        
-        def generator_thread():
-            try:
-                for message in run_briefing(should_generate_audio, should_generate_video):
-                    message_queue.put(("message", message))
-            except Exception as e:
-                message_queue.put(("error", str(e)))
-            finally:
-                message_queue.put(("done", None))
-        
-        thread = threading.Thread(target=generator_thread, daemon=True)
-        thread.start()
-        
-        try:
-            while True:
-                try:
-                    msg_type, data = message_queue.get(timeout=0.01)
-                    
-                    if msg_type == "message":
-                        if websocket.client_state.value == 1:
-                            await websocket.send_json(data)
-                            # Force immediate send with small delay to prevent buffering
-                            import asyncio
-                            await asyncio.sleep(0.001)
-                    elif msg_type == "error":
-                        await websocket.send_json({"type": "error", "message": data})
-                        break
-                    elif msg_type == "done":
-                        break
-                        
-                except queue.Empty:
-                    if websocket.client_state.value != 1:
-                        break
-                    # Small sleep to yield to event loop
-                    import asyncio
-                    try:
-                        await asyncio.sleep(0.001)
-                    except:
-                        pass
-                    continue
-                    
-        except Exception as send_err:
-            pass
-        
+        cache_key = make_key(topic, location, should_generate_audio, should_generate_video, audio_format)
+        cached = await run_blocking(lookup_cached, cache_key)
+        if cached:
+            await websocket.send_json({"type": "status", "content": f"⚡ Serving cached briefing for '{topic}' ({location})...\n"})
+            if cached["video_url"]:
+                await websocket.send_json({"type": "video_ready", "url": cached["video_url"]})
+            await websocket.send_json({"type": "result", "content": cached["content"]})
+            await websocket.close()
+            return
+
+        # Attach to an identical in-progress briefing, or start one.
+        # Late joiners replay the events they missed, then follow live.
+        flight, is_leader = await start_briefing(cache_key, {
+            "topic": topic, "location": location, "enable_audio": should_generate_audio,
+            "enable_video": should_generate_video, "audio_format": audio_format,
+        }, INTERACTIVE)
+        # Tell the client which job this is so it can reconnect with {"jobId", "offset"}
+        await websocket.send_json({"type": "job", "jobId": flight.job_id})
+        if not is_leader:
+            await websocket.send_json({"type": "status", "content": f"🔗 Joining briefing already in progress for '{topic}'...\n"})
+
+        await forward_flight(websocket, flight, timings=timings)
         await websocket.close()
 
     except WebSocketDisconnect:
@@ -479,42 +342,75 @@ CRITICAL: Include ONLY 2-3 images from X about {location} (pbs.twimg.com URLs).
         finally:
             await websocket.close()
 
-@app.post("/generate-script", response_model=VideoScriptResponse)
-async def generate_script(request: VideoScriptRequest):
-    """Generate a video script using Grok API based on the given topic."""
-    if not os.getenv("XAI_API_KEY"):
-        raise HTTPException(status_code=500, detail="XAI_API_KEY not configured")
-    
-    try:
-        chat = client.chat.create(
-            model="grok-4-1-fast",
-            tools=[x_search(enable_image_understanding=True, enable_video_understanding=True)],
-            include=["verbose_streaming"],
+@app.get("/stream/audio/{filename}")
+async def stream_audio(filename: str, request: Request, format: str = None):
+    """Serve a podcast while it is still being synthesized, or the finished file once it is done.
+
+    A different codec can be requested with ?format=mp3|opus|wav or the Accept header;
+    it is transcoded on the fly with ffmpeg.
+    """
+    if os.path.basename(filename) != filename:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    writer = active_writers.get(filename)
+    if writer is not None:
+        path, source_codec = writer.path, "wav"
+        follow = lambda: follow_wav(writer)
+    else:
+        path, source_codec = find_finished_audio(filename)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        # In workers mode the podcast is written by a worker process: follow it on disk
+        follow = (lambda: follow_wav_file(path)) if source_codec == "wav" and wav_in_progress(path) else None
+
+    wanted = negotiate_codec(format, request.headers.get("accept"))
+    if wanted and wanted != source_codec and can_encode(wanted):
+        source = follow() if follow is not None else read_file_chunks(path)
+        return StreamingResponse(
+            pinned_chunks(artifact_store, path, transcode_stream(source, wanted)),
+            media_type=AUDIO_CODECS[wanted]["media_type"],
         )
-        
-        # System prompt
-        chat.append(
-            user("You are an expert video scriptwriter and researcher. Return ONLY valid JSON with this structure: {\"headline\": \"title\", \"summary\": \"2-3 sentence overview\", \"confirmed_facts\": [\"fact1\", \"fact2\", \"fact3\"], \"unconfirmed_claims\": [\"claim1\"], \"recent_changes\": [\"change1\"], \"watch_next\": [\"topic1\"], \"script\": \"full 2-5 minute video script\"}")
-        )
-        
-        # User request
-        chat.append(user(f"Generate content for topic: {request.topic}"))
-        
-        # Stream and collect response
-        script_content = ""
-        for response, chunk in chat.stream():
-            if chunk.content:
-                script_content += chunk.content
-        
-        return VideoScriptResponse(script=script_content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating script: {str(e)}")
+
+    if follow is not None:
+        return StreamingResponse(pinned_chunks(artifact_store, path, follow()), media_type="audio/wav")
+    return PinnedFileResponse(path, media_type=AUDIO_CODECS[source_codec]["media_type"], store=artifact_store)
 
 @app.get("/health")
 async def health():
     """Health check endpoint."""
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus exposition of per-stage span histograms and counters."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/artifacts/stats")
+async def artifact_stats():
+    """Size, quota usage and eviction counters of the audio/ and videos/ stores."""
+    return await run_blocking(artifact_store.stats)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, current stage and event count of a briefing job."""
+    job = await run_blocking(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    """Queue depth, wait times and token levels of the outbound xAI call scheduler."""
+    return api_scheduler.stats()
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and occupancy of the briefing result cache."""
+    return {**briefing_cache.stats(), "flights": briefing_flights.stats(), "tailing": job_tailer.stats(), "tts_segments": tts_cache.stats(),
+            "video_clips": video_cache.stats(), "jobs": job_store.stats()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
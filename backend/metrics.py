@@ -0,0 +1,165 @@
+"""Per-briefing timing spans and Prometheus metrics.
+
+span("tts") times a block: its duration is added to the briefing_span_seconds
+histogram (exported on /metrics) and, if a briefing is being traced in the
+current context, to that briefing's Trace, which run_briefing sends as the
+`timings` event. The trace is a contextvar, so like the scheduler's owner it
+follows the briefing into stage threads and onto the event loop.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Bucket upper bounds (seconds): from single WebSocket sends up to multi-minute video waits
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(float(b) for b in buckets)
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, {'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+SPAN_SECONDS = Histogram("briefing_span_seconds", "Duration of briefing pipeline spans.", ["span"])
+SPAN_ERRORS = Counter("briefing_span_errors_total", "Briefing pipeline spans that ended with an exception.", ["span"])
+VIDEO_STATUS_CHECKS = Histogram("video_job_status_checks", "Status checks made per video generation job.",
+                                buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55))
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Spans recorded on behalf of one briefing."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def add(self, name: str, start: float, seconds: float, attrs: dict):
+        with self._lock:
+            self.spans.append({"name": name, "start": round(start - self.started, 3), "seconds": round(seconds, 3),
+                               **attrs})
+
+    def summary(self) -> dict:
+        """Per-span totals plus every span (start offsets in seconds from the start of the briefing)."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start"])
+        stages = {}
+        for s in spans:
+            stage = stages.setdefault(s["name"], {"count": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                  "first_start": s["start"], "last_end": 0.0})
+            stage["count"] += 1
+            stage["seconds"] = round(stage["seconds"] + s["seconds"], 3)
+            stage["max_seconds"] = max(stage["max_seconds"], s["seconds"])
+            stage["last_end"] = max(stage["last_end"], round(s["start"] + s["seconds"], 3))
+        return {"total_seconds": round(self.elapsed(), 3), "stages": stages, "spans": spans}
+
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def start_trace() -> Trace:
+    """Trace the spans recorded from this context (and the threads and tasks it starts) from now on."""
+    trace = Trace()
+    current_trace.set(trace)
+    return trace
+
+
+def record(name: str, seconds: float, start: float = None, **attrs):
+    """Record a span measured by the caller; start is its perf_counter() start (default: now - seconds)."""
+    SPAN_SECONDS.observe(seconds, span=name)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, time.perf_counter() - seconds if start is None else start, seconds, attrs)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the enclosed block as span name; the block can add attributes to the yielded dict."""
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except Exception:
+        attrs["error"] = True
+        SPAN_ERRORS.inc(span=name)
+        raise
+    finally:
+        record(name, time.perf_counter() - start, start, **attrs)
@@ -0,0 +1,257 @@
+import asyncio
+import contextvars
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INTERACTIVE = 0  # a WebSocket client is waiting on the result
+BATCH = 1
+
+# Upper bound on outbound xAI calls in progress at once, across every endpoint
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "16"))
+# Per-endpoint token buckets: requests per second and burst size (rate 0 disables the limit)
+API_RATES = {
+    "chat": (float(os.getenv("API_RATE_CHAT", "2")), float(os.getenv("API_BURST_CHAT", "5"))),
+    "tts": (float(os.getenv("API_RATE_TTS", "5")), float(os.getenv("API_BURST_TTS", "10"))),
+    "video": (float(os.getenv("API_RATE_VIDEO", "5")), float(os.getenv("API_BURST_VIDEO", "10"))),
+}
+
+# Which briefing (and how urgent) the calls made in this context belong to
+current_owner = contextvars.ContextVar("current_owner", default=None)
+current_priority = contextvars.ContextVar("current_priority", default=BATCH)
+
+
+def bind_owner(owner, priority: int = BATCH):
+    """Attribute the calls made from this context on to owner at the given priority."""
+    current_owner.set(owner)
+    current_priority.set(priority)
+
+
+def scheduled_iter(endpoint: str, make_iter):
+    """Iterate make_iter() (e.g. a chat stream) while holding a slot for endpoint until it ends."""
+    with api_scheduler.slot(endpoint):
+        yield from make_iter()
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until the next token is available."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class Ticket:
+    __slots__ = ("endpoint", "owner", "priority", "seq", "enqueued_at", "grant")
+
+    def __init__(self, endpoint: str, owner, priority: int, seq: int, grant):
+        self.endpoint = endpoint
+        self.owner = owner
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.grant = grant
+
+
+class EndpointStats:
+    def __init__(self):
+        self.granted = 0
+        self.active = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class APIScheduler:
+    """Process-wide admission control for outbound xAI calls (chat, realtime TTS, video).
+
+    A call takes a slot before it starts and releases it when done. A slot is
+    granted only while fewer than max_concurrency calls are active and the
+    endpoint's token bucket has a token. Waiting calls are served by priority
+    (interactive before batch), then by whichever owner has the fewest calls
+    in flight and has been served least, then first come first served, so
+    one large briefing cannot starve the others. Works from threads (slot) and from
+    event loops (aslot) without tying up a thread while waiting.
+    """
+
+    def __init__(self, max_concurrency: int = API_MAX_CONCURRENCY, rates: dict = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self._buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in (rates or API_RATES).items()}
+        self._stats = {name: EndpointStats() for name in self._buckets}
+        self._waiting = []
+        self._inflight = {}  # owner -> active calls
+        self._served = {}  # owner -> slots granted while it had work queued or running
+        self._active = 0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def _endpoint(self, endpoint: str) -> str:
+        if endpoint not in self._buckets:
+            raise ValueError(f"Unknown API endpoint '{endpoint}'")
+        return endpoint
+
+    def _enqueue(self, endpoint: str, owner, priority, grant) -> Ticket:
+        owner = current_owner.get() if owner is None else owner
+        priority = current_priority.get() if priority is None else priority
+        ticket = Ticket(self._endpoint(endpoint), owner, priority, next(self._seq), grant)
+        with self._lock:
+            if owner not in self._served:
+                # Newcomers start level with the least-served owner instead of jumping ahead of everyone
+                self._served[owner] = min(self._served.values(), default=0)
+            self._waiting.append(ticket)
+            granted = self._dispatch()
+        self._notify(granted)
+        return ticket
+
+    def _dispatch(self) -> list:
+        """Grant as many waiting tickets as limits allow. Caller holds the lock; returns the granted tickets."""
+        granted = []
+        now = time.monotonic()
+        retry_in = None
+        while self._waiting and self._active < self.max_concurrency:
+            self._waiting.sort(key=lambda t: (t.priority, self._inflight.get(t.owner, 0), self._served[t.owner], t.seq))
+            for ticket in self._waiting:
+                bucket = self._buckets[ticket.endpoint]
+                if bucket.take(now):
+                    break
+                wait = bucket.wait_time(now)
+                retry_in = wait if retry_in is None else min(retry_in, wait)
+            else:
+                break
+            self._waiting.remove(ticket)
+            self._active += 1
+            self._inflight[ticket.owner] = self._inflight.get(ticket.owner, 0) + 1
+            self._served[ticket.owner] += 1
+            stats = self._stats[ticket.endpoint]
+            waited = now - ticket.enqueued_at
+            stats.granted += 1
+            stats.active += 1
+            stats.wait_total += waited
+            stats.wait_max = max(stats.wait_max, waited)
+            granted.append(ticket)
+
+        if self._waiting and retry_in is not None and self._timer is None:
+            # Every waiter is blocked on an empty bucket; look again once a token has refilled
+            self._timer = threading.Timer(retry_in + 0.001, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+        return granted
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            granted = self._dispatch()
+        self._notify(granted)
+
+    @staticmethod
+    def _notify(granted: list):
+        for ticket in granted:
+            ticket.grant()
+
+    def _release(self, ticket: Ticket):
+        with self._lock:
+            self._active -= 1
+            self._stats[ticket.endpoint].active -= 1
+            remaining = self._inflight.get(ticket.owner, 0) - 1
+            if remaining > 0:
+                self._inflight[ticket.owner] = remaining
+            else:
+                self._inflight.pop(ticket.owner, None)
+                self._forget_if_idle(ticket.owner)
+            granted = self._dispatch()
+        self._notify(granted)
+
+    def _forget_if_idle(self, owner):
+        if owner not in self._inflight and not any(t.owner == owner for t in self._waiting):
+            self._served.pop(owner, None)
+
+    @contextmanager
+    def slot(self, endpoint: str, owner=None, priority: int = None):
+        """Block the calling thread until the call may start; the slot is released on exit."""
+        granted = threading.Event()
+        ticket = self._enqueue(endpoint, owner, priority, granted.set)
+        granted.wait()
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, endpoint: str, owner=None, priority: int = None):
+        """Await until the call may start; the slot is released on exit."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def grant():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        ticket = self._enqueue(endpoint, owner, priority, grant)
+        try:
+            await granted
+        except BaseException:
+            with self._lock:
+                waiting = ticket in self._waiting
+                if waiting:
+                    self._waiting.remove(ticket)
+                    self._forget_if_idle(ticket.owner)
+            if not waiting:
+                # Granted just as we were cancelled
+                self._release(ticket)
+            raise
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            endpoints = {}
+            for name, stats in self._stats.items():
+                queued = [t for t in self._waiting if t.endpoint == name]
+                endpoints[name] = {
+                    "queued": len(queued),
+                    "active": stats.active,
+                    "granted": stats.granted,
+                    "wait_avg_ms": round(1000 * stats.wait_total / stats.granted, 1) if stats.granted else 0.0,
+                    "wait_max_ms": round(1000 * stats.wait_max, 1),
+                    "oldest_wait_ms": round(1000 * max((now - t.enqueued_at for t in queued), default=0.0), 1),
+                    "tokens": round(self._buckets[name].tokens, 2),
+                    "rate_per_sec": self._buckets[name].rate,
+                }
+            return {
+                "active": self._active,
+                "max_concurrency": self.max_concurrency,
+                "queued": len(self._waiting),
+                "queued_interactive": sum(1 for t in self._waiting if t.priority == INTERACTIVE),
+                "owners": len(self._inflight),
+                "endpoints": endpoints,
+            }
+
+
+api_scheduler = APIScheduler()
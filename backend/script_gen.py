@@ -3,11 +3,14 @@ import os
 from dotenv import load_dotenv
 from xai_sdk import Client
 from xai_sdk.chat import user, system
+from scheduler import api_scheduler, scheduled_iter
+from stream_json import StreamingJSONParser
 
 load_dotenv()
 
 client = Client(
     api_key=os.getenv("XAI_API_KEY"),
+    api_host=os.getenv("XAI_API_HOST", "api.x.ai"),
     timeout=3600,
 )
 
@@ -40,6 +43,10 @@ Editorial rules:
 """
 
 
+# The briefing fields build_user_prompt reads; the script depends on nothing else
+SCRIPT_FIELDS = ("headline", "summary", "confirmed_facts", "unconfirmed_claims", "recent_changes", "watch_next")
+
+
 def build_user_prompt(info: dict) -> str:
     # Helper function to convert items to strings
     def to_string_list(items):
@@ -102,7 +109,8 @@ def generate_script(info: dict) -> str:
     chat = client.chat.create(model="grok-4")
     chat.append(system(SYSTEM_PROMPT))
     chat.append(user(build_user_prompt(info)))
-    response = chat.sample()
+    with api_scheduler.slot("chat"):
+        response = chat.sample()
     result = json.loads(response.content)
     if type(result) == dict:
         if result.get("segments"):
@@ -110,4 +118,50 @@ def generate_script(info: dict) -> str:
         else:
             return ""
     else:
-        return result
\ No newline at end of file
+        return result
+
+
+def strip_fence(text: str) -> str:
+    """text without surrounding whitespace and the ```json fence models sometimes wrap JSON in."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rstrip()
+        if text.endswith("```"):
+            text = text[:-3]
+    return text.strip()
+
+
+def stream_script(info: dict):
+    """Streaming generate_script: yields each segment dict as soon as it is complete in the response.
+
+    TTS and video generation can start on the first segment while the rest
+    of the script is still being written. Only a {"segments": [...]} object
+    is streamed; any other shape (e.g. a bare list of segments) is parsed
+    once the response is complete.
+    """
+    chat = client.chat.create(model="grok-4")
+    chat.append(system(SYSTEM_PROMPT))
+    chat.append(user(build_user_prompt(info)))
+    parser = StreamingJSONParser()
+    content = ""
+    fed = 0
+    streamed = 0
+    for response, chunk in scheduled_iter("chat", chat.stream):
+        if not chunk.content:
+            continue
+        content += chunk.content
+        # The parser skips anything before the first "{", so it must never see a list
+        if strip_fence(content)[:1] != "{":
+            continue
+        for event in parser.feed(content[fed:]):
+            if event["type"] == "item" and event["field"] == "segments":
+                streamed += 1
+                yield event["value"]
+        fed = len(content)
+    result = parser.result()
+    if result is None or "segments" not in result:
+        # Not a single {"segments": [...]} object: parse the whole response instead
+        result = json.loads(strip_fence(content))
+        segments = (result.get("segments") or []) if type(result) == dict else result
+        yield from segments[streamed:]
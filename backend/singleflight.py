@@ -0,0 +1,257 @@
+import asyncio
+import os
+import threading
+import traceback
+import uuid
+from dotenv import load_dotenv
+
+from job_store import job_store, ACTIVE_STATUSES
+
+load_dotenv()
+
+# How often the web tier checks the job store for new events of jobs run by worker processes
+JOB_TAIL_INTERVAL = float(os.getenv("JOB_TAIL_INTERVAL", "0.1"))
+
+
+class Flight:
+    """Append-only event log for one in-progress briefing, shared by all subscribers.
+
+    The producer publishes events; every subscriber replays the log from the
+    start and then follows live events until the flight finishes. Subscribers
+    only hold a cursor into the shared log, so a slow reader never buffers
+    its own copy of the stream.
+    """
+
+    def __init__(self, key, job_id: str = None):
+        self.key = key
+        self.job_id = job_id
+        self.events = []
+        self.done = False
+        self.error = None  # exception that stopped the producer, if any
+        self.subscribers = 0
+        self._cond = threading.Condition()
+        self._async_waiters = set()  # (loop, asyncio.Event) per async subscriber
+
+    def stamp(self, event: dict) -> dict:
+        """Return event tagged with the sequence number it will get in this log."""
+        with self._cond:
+            return {**event, "seq": len(self.events)}
+
+    def publish(self, event: dict):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+            waiters = list(self._async_waiters)
+        self._wake(waiters)
+
+    def finish(self, error: Exception = None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+            waiters = list(self._async_waiters)
+        self._wake(waiters)
+
+    @staticmethod
+    def _wake(waiters):
+        for loop, wakeup in waiters:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                pass
+
+    def subscribe(self, start: int = 0):
+        """Yield every event from index start onwards, blocking for new ones until done."""
+        index = start
+        while True:
+            with self._cond:
+                while index >= len(self.events) and not self.done:
+                    self._cond.wait()
+                batch = self.events[index:]
+                finished = self.done
+            index += len(batch)
+            for event in batch:
+                yield event
+            if finished and index >= len(self.events):
+                return
+
+    async def subscribe_async(self, start: int = 0):
+        """Async version of subscribe(): sleeps on an asyncio.Event until the producer publishes.
+
+        Wrap in contextlib.aclosing() when breaking out early so the waiter is unregistered.
+        """
+        wakeup = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), wakeup)
+        with self._cond:
+            self._async_waiters.add(waiter)
+        index = start
+        try:
+            while True:
+                with self._cond:
+                    batch = self.events[index:]
+                    finished = self.done
+                    if not batch and not finished:
+                        # Cleared under the lock, so a publish after this point always sets it again
+                        wakeup.clear()
+                if not batch:
+                    if finished:
+                        return
+                    await wakeup.wait()
+                    continue
+                index += len(batch)
+                for event in batch:
+                    yield event
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+
+class SingleFlight:
+    """Coalesces concurrent identical requests onto a single producer.
+
+    The first caller for a key starts the producer in a background thread;
+    later callers for the same key attach to the running flight instead of
+    starting their own upstream work. If a journal (see job_store.JobStore)
+    is given, every flight is recorded as a job and each event is appended
+    to it before it is published.
+    """
+
+    def __init__(self, journal=None):
+        self.journal = journal
+        self._flights = {}
+        self._jobs = {}  # job_id -> running flight
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+
+    def join(self, key, producer):
+        """Return (flight, is_leader) for key, starting producer() if no flight is running.
+
+        producer is a zero-argument callable returning an iterator of event dicts.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.subscribers += 1
+                self.coalesced += 1
+                return flight, False
+            # The job row is inserted by the producer thread, so joining never waits on the database
+            flight = Flight(key, uuid.uuid4().hex if self.journal else None)
+            flight.subscribers = 1
+            self._flights[key] = flight
+            if flight.job_id:
+                self._jobs[flight.job_id] = flight
+            self.started += 1
+
+        thread = threading.Thread(target=self._run, args=(flight, producer), daemon=True)
+        thread.start()
+        return flight, True
+
+    def find_job(self, job_id: str):
+        """Return the running flight for job_id, or None if it is not running in this process."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, flight: Flight, producer):
+        if self.journal and flight.job_id:
+            try:
+                self.journal.start(flight.key, flight.job_id)
+            except Exception as e:
+                print(f"⚠️  Could not record job {flight.job_id}: {e}")
+        try:
+            for event in producer():
+                self._publish(flight, event)
+        except Exception as e:
+            traceback.print_exc()
+            self._publish(flight, {"type": "error", "message": str(e)})
+        finally:
+            if self.journal and flight.job_id:
+                try:
+                    self.journal.finish(flight.job_id)
+                except Exception as e:
+                    # Subscribers must still be released below
+                    print(f"⚠️  Could not close job {flight.job_id}: {e}")
+            # Unregister before finishing so a new request after this point starts fresh
+            with self._lock:
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+                self._jobs.pop(flight.job_id, None)
+            flight.finish()
+
+    def _publish(self, flight: Flight, event: dict):
+        # Only the producer thread publishes, so the stamped seq is the one the event gets
+        event = flight.stamp(event)
+        if self.journal and flight.job_id:
+            try:
+                self.journal.append(flight.job_id, event)
+            except Exception as e:
+                print(f"⚠️  Could not persist event {event['seq']} of job {flight.job_id}: {e}")
+        flight.publish(event)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "started": self.started,
+                "coalesced": self.coalesced,
+            }
+
+
+class JobTailer:
+    """Mirrors jobs run by other processes (see worker.py) into local Flights.
+
+    One polling task per job reads new events from the store and publishes
+    them, so every WebSocket following that job in this process shares a
+    single reader no matter how many clients are attached.
+    """
+
+    def __init__(self, store=job_store, interval: float = JOB_TAIL_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self._flights = {}  # job_id -> Flight being tailed
+        self._lock = threading.Lock()
+
+    def follow(self, job_id: str) -> Flight:
+        """Return a Flight replaying and following job_id. Must be called from an event loop."""
+        with self._lock:
+            flight = self._flights.get(job_id)
+            if flight is not None:
+                flight.subscribers += 1
+                return flight
+            flight = Flight(job_id, job_id)
+            flight.subscribers = 1
+            self._flights[job_id] = flight
+        asyncio.get_running_loop().create_task(self._tail(flight))
+        return flight
+
+    async def _tail(self, flight: Flight):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Read the status before the events, so the last events of a job that finishes in between are not lost
+                job = await loop.run_in_executor(None, self.store.get, flight.job_id)
+                if job is None:
+                    flight.publish({"type": "error", "message": "Unknown or expired job"})
+                    return
+                events = await loop.run_in_executor(None, self.store.events, flight.job_id, len(flight.events))
+                for event in events:
+                    flight.publish(event)
+                if job["status"] not in ACTIVE_STATUSES:
+                    return
+                await asyncio.sleep(self.interval)
+        except Exception as e:
+            traceback.print_exc()
+            flight.publish({"type": "error", "message": str(e)})
+        finally:
+            with self._lock:
+                self._flights.pop(flight.job_id, None)
+            flight.finish()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tailing": len(self._flights)}
+
+
+briefing_flights = SingleFlight(journal=job_store)
+job_tailer = JobTailer()
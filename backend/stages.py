@@ -0,0 +1,76 @@
+import contextvars
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StageSkipped(Exception):
+    """Raised for a stage whose dependency failed."""
+
+
+class StageGraph:
+    """Tiny DAG executor for the post-search briefing pipeline.
+
+    Each stage is func(deps, emit) where deps maps dependency names to their
+    results and emit(event) forwards a progress event to the caller. A stage
+    starts as soon as all of its dependencies have finished, so independent
+    stages (e.g. audio and video) run in parallel. A failed stage is logged
+    and its dependents are skipped; unrelated stages keep going.
+    """
+
+    def __init__(self):
+        self._stages = {}  # name -> (func, deps)
+        self.results = {}
+        self.errors = {}
+
+    def add(self, name: str, func, deps=()):
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = (func, tuple(deps))
+        return self
+
+    def run(self):
+        """Run every stage, yielding emitted events as they arrive. Blocks until all stages finish."""
+        events = queue.Queue()
+        pending = dict(self._stages)
+        running = set()
+        done_marker = object()
+
+        with ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix="stage") as pool:
+
+            def launch_ready():
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name, (func, deps) in list(pending.items()):
+                        failed = [dep for dep in deps if dep in self.errors]
+                        if failed:
+                            del pending[name]
+                            self.errors[name] = StageSkipped(f"dependency '{failed[0]}' failed")
+                            progressed = True
+                        elif all(dep in self.results for dep in deps):
+                            del pending[name]
+                            running.add(name)
+                            inputs = {dep: self.results[dep] for dep in deps}
+                            # Copy the caller's context so contextvars follow the stage into its thread
+                            ctx = contextvars.copy_context()
+                            future = pool.submit(ctx.run, func, inputs, events.put)
+                            future.add_done_callback(lambda f, n=name: events.put((done_marker, n, f)))
+
+            launch_ready()
+            while running:
+                item = events.get()
+                if isinstance(item, tuple) and item and item[0] is done_marker:
+                    _, name, future = item
+                    running.discard(name)
+                    error = future.exception()
+                    if error is None:
+                        self.results[name] = future.result()
+                    else:
+                        print(f"❌ Stage '{name}' failed: {error}")
+                        traceback.print_exception(type(error), error, error.__traceback__)
+                        self.errors[name] = error
+                    launch_ready()
+                else:
+                    yield item
@@ -0,0 +1,159 @@
+import json
+
+
+class StreamingJSONParser:
+    """Incremental parser for a JSON object arriving in chunks (e.g. a chat stream).
+
+    feed() scans each chunk once and returns events for values completed so
+    far: a "field" event for every top-level member that is not an array,
+    and an "item" event for every element of a top-level array, so consumers
+    can act on the headline or the first fact before the model finishes.
+    Completed values are assembled into .document as they arrive, and
+    .finished holds the top-level fields whose value (or list) is final.
+
+    item_filters maps an array field to a predicate; items it rejects are
+    dropped from both the events and the document. Text before the opening
+    brace (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self, item_filters: dict = None):
+        self.item_filters = item_filters or {}
+        self.document = {}
+        self.finished = set()
+        self.complete = False
+        self.failed = False
+        self._text = ""
+        self._offset = 0  # position of _text[0] in the whole stream
+        self._depth = 0
+        self._key = None
+        self._expect = "key"  # root object: key | colon | value | comma
+        self._array = None  # top-level member whose array is open
+        self._array_expect = "item"  # item | comma
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._scalar = False
+        self._capture = None  # (start, depth) of the field or item being read
+
+    def feed(self, chunk: str) -> list:
+        if self.complete or self.failed or not chunk:
+            return []
+        events = []
+        base = self._offset + len(self._text)
+        self._text += chunk
+        try:
+            for i, c in enumerate(chunk, base):
+                self._step(c, i, events)
+                if self.complete:
+                    break
+        except ValueError:
+            self.failed = True
+        self._trim()
+        return events
+
+    def result(self):
+        """The parsed document once the closing brace has been seen, otherwise None."""
+        return self.document if self.complete and not self.failed else None
+
+    def _slice(self, start: int, end: int) -> str:
+        return self._text[start - self._offset:end - self._offset]
+
+    def _trim(self):
+        # Only the value being captured (or the key being read) is still needed
+        keep = [p for p in (self._capture and self._capture[0], self._string_start) if p is not None]
+        cut = min(keep) if keep else self._offset + len(self._text)
+        self._text = self._text[cut - self._offset:]
+        self._offset = cut
+
+    def _step(self, c: str, i: int, events: list):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                self._end_string(i, events)
+            return
+
+        if self._scalar and c in ",}] \t\r\n":
+            self._scalar = False
+            self._end_value(i, events)
+
+        if c in " \t\r\n":
+            return
+        if self._depth == 0:
+            if c == "{":
+                self._depth = 1
+            return
+
+        if c == '"':
+            if self._depth == 1 and self._expect == "key":
+                self._string_start = i
+            else:
+                self._begin_value(i)
+            self._in_string = True
+        elif c in "{[":
+            if c == "[" and self._depth == 1 and self._expect == "value":
+                # Top-level arrays are streamed item by item
+                self._array = self._key
+                self._array_expect = "item"
+                self.document[self._key] = []
+                self._expect = "comma"
+            else:
+                self._begin_value(i)
+            self._depth += 1
+        elif c in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self.complete = True
+            elif self._depth == 1 and self._array is not None and self._capture is None:
+                self.finished.add(self._array)
+                self._array = None
+            else:
+                self._end_value(i + 1, events)
+        elif c == ":":
+            if self._depth == 1:
+                self._expect = "value"
+        elif c == ",":
+            if self._depth == 1:
+                self._expect = "key"
+            elif self._depth == 2 and self._array is not None:
+                self._array_expect = "item"
+        elif not self._scalar:
+            self._begin_value(i)
+            self._scalar = True
+
+    def _begin_value(self, i: int):
+        if self._depth == 1 and self._expect == "value":
+            self._capture = (i, 1)
+            self._expect = "comma"
+        elif self._depth == 2 and self._array is not None and self._array_expect == "item":
+            self._capture = (i, 2)
+            self._array_expect = "comma"
+
+    def _end_string(self, i: int, events: list):
+        if self._string_start is not None:
+            self._key = json.loads(self._slice(self._string_start, i + 1))
+            self._string_start = None
+            self._expect = "colon"
+        else:
+            self._end_value(i + 1, events)
+
+    def _end_value(self, end: int, events: list):
+        if self._capture is None or self._capture[1] != self._depth:
+            return
+        start, depth = self._capture
+        self._capture = None
+        value = json.loads(self._slice(start, end))
+        if depth == 1:
+            self.document[self._key] = value
+            self.finished.add(self._key)
+            events.append({"type": "field", "field": self._key, "value": value})
+            return
+        keep = self.item_filters.get(self._array)
+        if keep is not None and not keep(value):
+            return
+        items = self.document[self._array]
+        items.append(value)
+        events.append({"type": "item", "field": self._array, "index": len(items) - 1, "value": value})
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules build their xAI clients at import time; tests never reach the real API
+os.environ.setdefault("XAI_API_KEY", "test")
+# singleflight opens the module-level job store on import; keep it out of the working tree
+os.environ.setdefault("JOB_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="briefing-tests-"), "jobs.db"))
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import threading
+import time
+
+import audio_gen
+from audio_gen import STREAMING_DATA_SIZE, StreamingWavWriter, follow_wav_file, wav_header, wav_in_progress
+
+
+async def collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+def test_follows_wav_written_elsewhere(tmp_path):
+    path = str(tmp_path / "podcast.wav")
+    writer = StreamingWavWriter(path)
+    assert wav_in_progress(path)
+
+    def write():
+        for i in range(5):
+            time.sleep(0.02)
+            writer.write(bytes([i]) * 1000)
+        writer.close()
+
+    # Only the file is shared with the reader, as with a worker process
+    thread = threading.Thread(target=write)
+    thread.start()
+    streamed = asyncio.run(collect(follow_wav_file(path, chunk_size=700, poll_interval=0.005)))
+    thread.join()
+
+    assert streamed[:audio_gen.WAV_HEADER_BYTES] == wav_header(STREAMING_DATA_SIZE)
+    assert streamed[audio_gen.WAV_HEADER_BYTES:] == b"".join(bytes([i]) * 1000 for i in range(5))
+    assert not wav_in_progress(path)
+
+
+def test_stops_following_abandoned_wav(tmp_path):
+    path = str(tmp_path / "podcast.wav")
+    writer = StreamingWavWriter(path)
+    writer.write(b"\x01\x02" * 10)
+    streamed = asyncio.run(collect(follow_wav_file(path, poll_interval=0.005, idle_timeout=0.05)))
+    assert streamed[audio_gen.WAV_HEADER_BYTES:] == b"\x01\x02" * 10
+
+    os.utime(path, (0, 0))
+    assert not wav_in_progress(path)
+
+
+def test_segments_are_written_in_order_off_the_calling_thread(tmp_path):
+    writer = StreamingWavWriter(str(tmp_path / "podcast.wav"))
+    file_writes = []
+    real_write = writer._file.write
+
+    def record_write(data):
+        file_writes.append(threading.current_thread())
+        return real_write(data)
+
+    writer._file.write = record_write
+    ordered = audio_gen.OrderedSegmentWriter(writer, 2, padding_ms=0)
+    ordered.write(1, b"\x02\x00" * 100)  # buffered until segment 0 is done
+    ordered.write(0, b"\x01\x00" * 100)
+    ordered.finish(0)
+    ordered.finish(1)
+    writer.close()
+
+    with open(writer.path, "rb") as f:
+        data = f.read()
+    assert data[:audio_gen.WAV_HEADER_BYTES] == wav_header(400)
+    assert data[audio_gen.WAV_HEADER_BYTES:] == b"\x01\x00" * 100 + b"\x02\x00" * 100
+    # The PCM went to disk on the writer thread; only close() patches the header from the caller
+    assert set(file_writes[:-1]) == {writer._thread} and file_writes[-1] is threading.current_thread()
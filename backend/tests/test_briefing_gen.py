@@ -0,0 +1,78 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import briefing_gen
+from singleflight import Flight
+
+BRIEFING = {
+    "headline": "Storm hits the coast",
+    "summary": "A storm made landfall overnight.",
+    "confirmed_facts": [{"text": "Power is out downtown.", "sourceUrl": "https://x.com/a/status/1"}],
+    "unconfirmed_claims": ["The bridge is closed."],
+    "recent_changes": ["Evacuation order lifted."],
+    "watch_next": ["Cleanup"],
+    "sources": [],
+}
+
+
+class FakeChat:
+    """A search stream that sends content, then raises if given an error."""
+
+    def __init__(self, content: str, error: Exception = None):
+        self.content = content
+        self.error = error
+
+    def append(self, message):
+        pass
+
+    def stream(self):
+        for start in range(0, len(self.content), 16):
+            yield SimpleNamespace(usage=None), SimpleNamespace(content=self.content[start:start + 16], tool_calls=[])
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def search(monkeypatch):
+    """Serve the search stream from a FakeChat; returns the cancel events of the scripts it starts."""
+    started = []
+
+    def start_script(info, cancelled=None):
+        started.append(cancelled)
+        return Flight("script")
+
+    def search(content: str, error: Exception = None):
+        chat = FakeChat(content, error)
+        monkeypatch.setattr(briefing_gen, "client", SimpleNamespace(chat=SimpleNamespace(create=lambda **kwargs: chat)))
+        return started
+
+    monkeypatch.setattr(briefing_gen, "SCRIPT_SPECULATION", True)
+    monkeypatch.setattr(briefing_gen, "start_script", start_script)
+    monkeypatch.setattr(briefing_gen.briefing_cache, "put", lambda key, value: None)
+    return search
+
+
+def test_search_error_cancels_speculative_script(search):
+    started = search(json.dumps(BRIEFING)[:-1], error=RuntimeError("stream reset"))
+    with pytest.raises(RuntimeError, match="stream reset"):
+        list(briefing_gen.run_briefing("storm", "Miami", enable_audio=True, enable_video=False))
+    assert len(started) == 1 and started[0].is_set()
+
+
+def test_closed_briefing_cancels_speculative_script(search):
+    started = search(json.dumps(BRIEFING)[:-1])
+    events = briefing_gen.run_briefing("storm", "Miami", enable_audio=True, enable_video=False)
+    for event in events:
+        if started:
+            break
+    events.close()
+    assert started[0].is_set()
+
+
+def test_unparseable_search_cancels_speculative_script(search):
+    started = search(json.dumps(BRIEFING)[:-1] + ', "media": [oops')
+    events = list(briefing_gen.run_briefing("storm", "Miami", enable_audio=True, enable_video=False))
+    assert events[-1]["type"] == "result"
+    assert len(started) == 1 and started[0].is_set()
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from job_store import JobStore
+from singleflight import SingleFlight
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def test_failed_append_rolls_back(store):
+    job_id = store.start("key")
+    with pytest.raises(TypeError):
+        store.append(job_id, {"type": "status", "content": object()})  # not JSON serializable
+    # The connection is usable again and the failed event did not use up a seq
+    assert store.append(job_id, {"type": "status", "content": "ok"})["seq"] == 0
+    store.finish(job_id)
+    assert [event["content"] for event in store.events(job_id)] == ["ok"]
+
+
+def test_flight_finishes_when_journal_finish_fails(store, monkeypatch):
+    def broken_finish(job_id):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(store, "finish", broken_finish)
+    flights = SingleFlight(journal=store)
+    flight, _ = flights.join("key", lambda: iter([{"type": "result", "content": "{}"}]))
+    assert [event["type"] for event in flight.subscribe()] == ["result"]
+    assert flight.done
+
+
+def test_recover_closes_jobs_of_a_dead_process(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    job_id = JobStore(path).start("key")  # its process "dies" before the first heartbeat
+    restarted = JobStore(path, lease=0.05)
+    assert restarted.get(job_id)["status"] == "running"
+    time.sleep(0.1)
+    restarted.recover()
+    assert restarted.get(job_id)["status"] == "interrupted"
+    assert restarted.events(job_id)[-1]["type"] == "error"
+
+
+def test_join_does_not_wait_for_the_job_row(store, monkeypatch):
+    release = threading.Event()
+    inserted_by = []
+    start = store.start
+
+    def slow_start(cache_key, job_id=None):
+        inserted_by.append(threading.current_thread())
+        release.wait(5)  # e.g. another process holds the write lock
+        return start(cache_key, job_id)
+
+    monkeypatch.setattr(store, "start", slow_start)
+    flights = SingleFlight(journal=store)
+    flight, _ = flights.join("key", lambda: iter([{"type": "result", "content": "{}"}]))
+    assert not release.is_set() and flights.find_job(flight.job_id) is flight
+    release.set()
+    assert [event["type"] for event in flight.subscribe()] == ["result"]
+    assert store.get(flight.job_id)["status"] == "done"
+    assert inserted_by and inserted_by[0] is not threading.current_thread()
@@ -0,0 +1,52 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import script_gen
+
+SEGMENTS = [
+    {"start_sec": 0, "end_sec": 10, "narration": "First.", "visuals": "Map", "overlay_text": "ONE"},
+    {"start_sec": 10, "end_sec": 20, "narration": "Second.", "visuals": "Card", "overlay_text": "TWO"},
+]
+
+
+class FakeChat:
+    def __init__(self, content: str, chunk_size: int):
+        self.content = content
+        self.chunk_size = chunk_size
+
+    def append(self, message):
+        pass
+
+    def stream(self):
+        for start in range(0, len(self.content), self.chunk_size):
+            yield None, SimpleNamespace(content=self.content[start:start + self.chunk_size])
+
+
+@pytest.fixture
+def respond(monkeypatch):
+    def respond(content: str, chunk_size: int = 7):
+        chat = FakeChat(content, chunk_size)
+        monkeypatch.setattr(script_gen, "client", SimpleNamespace(chat=SimpleNamespace(create=lambda **kwargs: chat)))
+    return respond
+
+
+def test_streams_segments_object(respond):
+    respond(json.dumps({"segments": SEGMENTS}))
+    assert list(script_gen.stream_script({})) == SEGMENTS
+
+
+def test_bare_list_of_segments(respond):
+    respond(json.dumps(SEGMENTS))
+    assert list(script_gen.stream_script({})) == SEGMENTS
+
+
+def test_fenced_bare_list(respond):
+    respond("```json\n" + json.dumps(SEGMENTS) + "\n```", chunk_size=3)
+    assert list(script_gen.stream_script({})) == SEGMENTS
+
+
+def test_object_without_segments_key(respond):
+    respond(json.dumps({"script": SEGMENTS}))
+    assert list(script_gen.stream_script({})) == []
@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import json
+
+import websockets
+
+from tts_pool import TTSSessionPool
+
+
+class FakeRealtime:
+    """Realtime TTS stand-in: two audio deltas per response; can hang up in the middle of one.
+
+    Like the real API it keeps each connection's conversation items until they
+    are deleted; context records how many items every response was generated with.
+    """
+
+    def __init__(self):
+        self.connections = 0
+        self.drop_next = False
+        self.context = []
+
+    async def handle(self, ws):
+        self.connections += 1
+        conversation = []
+        async for message in ws:
+            event = json.loads(message)
+            if event["type"] == "conversation.item.create":
+                conversation.append(event["item"]["id"])
+                await ws.send(json.dumps({"type": "conversation.item.created", "item": event["item"]}))
+            elif event["type"] == "conversation.item.delete":
+                conversation.remove(event["item_id"])
+                await ws.send(json.dumps({"type": "conversation.item.deleted", "item_id": event["item_id"]}))
+            elif event["type"] == "response.create":
+                if self.drop_next:
+                    self.drop_next = False
+                    await ws.close()
+                    return
+                self.context.append(len(conversation))
+                reply = f"reply_{len(self.context)}"
+                conversation.append(reply)
+                await ws.send(json.dumps({"type": "response.output_item.added", "item": {"id": reply}}))
+                for _ in range(2):
+                    await ws.send(json.dumps({"type": "response.output_audio.delta", "item_id": reply,
+                                              "delta": base64.b64encode(b"\x00\x01").decode()}))
+                await ws.send(json.dumps({"type": "response.output_audio.done", "item_id": reply}))
+                await ws.send(json.dumps({"type": "response.done"}))
+
+
+def run_with_server(test):
+    async def main():
+        fake = FakeRealtime()
+        async with websockets.serve(fake.handle, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            await test(fake, f"ws://127.0.0.1:{port}")
+    asyncio.run(main())
+
+
+def test_sessions_are_reused_across_segments():
+    async def test(fake, url):
+        pool = TTSSessionPool(max_connections=2, url=url)
+        for i in range(5):
+            deltas = []
+            assert await pool.speak(f"segment {i}", "Ara", deltas.append)
+            assert len(deltas) == 2
+        stats = pool.stats()
+        assert stats["created"] == 1
+        assert stats["reused"] == 4
+        assert fake.connections == 1
+        # Every utterance was generated from its own text only, not the earlier narration
+        assert fake.context == [1] * 5
+
+    run_with_server(test)
+
+
+def test_recovers_when_server_closes_mid_session():
+    async def test(fake, url):
+        pool = TTSSessionPool(max_connections=1, url=url)
+        assert await pool.speak("segment 0", "Ara", lambda delta: None)
+
+        # The server hangs up after the next request, before any audio
+        fake.drop_next = True
+        deltas = []
+        assert await pool.speak("segment 1", "Ara", deltas.append)
+        assert len(deltas) == 2
+        assert await pool.speak("segment 2", "Ara", lambda delta: None)
+
+        stats = pool.stats()
+        assert stats["created"] == 2
+        assert stats["failed"] == 1
+        assert stats["open"] <= pool.max_connections
+        assert fake.connections == 2
+
+    run_with_server(test)
@@ -0,0 +1,38 @@
+from concurrent.futures import Future
+
+from video_cache import VideoCache, local_url
+
+
+def test_first_download_is_kept_and_reused(tmp_path):
+    cache = VideoCache(str(tmp_path / "cache"), ttl=0)
+    job = Future()
+    submitted = []
+
+    def submit():
+        submitted.append(1)
+        return job
+
+    first = cache.get_or_submit("key", submit)
+    joined = cache.get_or_submit("key", submit)
+    assert joined is first and len(submitted) == 1
+
+    job.set_result("https://videos.example/clip.mp4")
+    # Handed out as rendered: whoever downloads it first adds the file to the cache
+    assert first.result() == "https://videos.example/clip.mp4"
+    downloaded = tmp_path / "segment_01.mp4"
+    downloaded.write_bytes(b"clip")
+    cache.keep(first.result(), str(downloaded))
+    cache.keep(first.result(), str(downloaded))  # a second download of the same clip is not stored again
+
+    path = cache.lookup("key")
+    assert open(path, "rb").read() == b"clip"
+    assert cache.get_or_submit("key", submit).result() == local_url(path)
+    assert len(submitted) == 1 and cache.hits == 1 and cache.coalesced == 1
+
+
+def test_unknown_urls_are_not_kept(tmp_path):
+    cache = VideoCache(str(tmp_path / "cache"))
+    downloaded = tmp_path / "clip.mp4"
+    downloaded.write_bytes(b"clip")
+    cache.keep("https://videos.example/other.mp4", str(downloaded))
+    assert list((tmp_path / "cache").iterdir()) == []
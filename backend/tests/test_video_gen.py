@@ -0,0 +1,57 @@
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import video_gen
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+CLIP_SECONDS = (1, 2, 3)
+
+
+@pytest.fixture(scope="module")
+def clips(tmp_path_factory):
+    """One small rendered clip per length in CLIP_SECONDS."""
+    directory = tmp_path_factory.mktemp("clips")
+    clips = {}
+    for seconds in CLIP_SECONDS:
+        path = str(directory / f"clip_{seconds}s.mp4")
+        subprocess.run([
+            "ffmpeg", "-f", "lavfi", "-i", f"testsrc=duration={seconds}:size=160x90:rate=12",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", "-y", path,
+        ], check=True, capture_output=True)
+        clips[seconds] = path
+    return clips
+
+
+def duration_of(path: str) -> float:
+    probe = subprocess.run(["ffmpeg", "-i", path], capture_output=True, text=True)
+    hours, minutes, seconds = re.search(r"Duration: (\d+):(\d+):([\d.]+)", probe.stderr).groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def test_parallel_combines_keep_their_own_segments(clips, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(video_gen, "VIDEO_SCRATCH_DIR", str(tmp_path / "scratch"))
+    # URLs look like stub://<seconds>/<job>/<segment>; clips are copied instead of downloaded
+    monkeypatch.setattr(video_gen, "download_video",
+                        lambda url, output_path: shutil.copyfile(clips[int(url[7:].split("/")[0])], output_path))
+
+    def combine(job: int):
+        seconds = CLIP_SECONDS[job % len(CLIP_SECONDS)]
+        urls = [{"url": f"stub://{seconds}/{job}/{i}"} for i in range(3)]
+        return seconds * 3, video_gen.combine_videos(urls, output_filename=f"combined_{job}.mp4")
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(combine, range(6)))
+
+    # Every job used clips of one length, so a mixed-up segment changes its duration
+    for expected, output_path in results:
+        assert output_path is not None
+        assert duration_of(output_path) == pytest.approx(expected, abs=0.5)
+    assert len({output_path for _, output_path in results}) == 6
+    assert os.listdir(tmp_path / "scratch") == []
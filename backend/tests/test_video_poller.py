@@ -0,0 +1,65 @@
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+
+import video_poller
+from video_poller import VideoJobPoller
+
+
+class FakeVideoPoller(VideoJobPoller):
+    """Poller whose HTTP calls are answered by handler instead of the video API."""
+
+    def __init__(self, handler):
+        super().__init__("http://video.test")
+        self.handler = handler
+
+    async def _setup(self):
+        await super()._setup()
+        await self._client.aclose()
+        self._client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+    def close(self):
+        async def shutdown():
+            for task in asyncio.all_tasks():
+                if task is not asyncio.current_task():
+                    task.cancel()
+            await self._client.aclose()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(video_poller, "VIDEO_POLL_INITIAL", 0.01)
+    monkeypatch.setattr(video_poller, "VIDEO_POLL_JITTER", 0)
+
+
+def test_stalled_check_does_not_hold_up_other_jobs():
+    release = threading.Event()
+
+    async def handler(request: httpx.Request):
+        if request.method == "POST":
+            return httpx.Response(200, json={"request_id": json.loads(request.content)["prompt"]})
+        request_id = request.url.path.rsplit("/", 1)[1]
+        if request_id == "stalled":
+            # e.g. waiting for a scheduler slot held by long chat streams
+            while not release.is_set():
+                await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"video": {"url": f"https://videos.example/{request_id}.mp4"}})
+
+    poller = FakeVideoPoller(handler)
+    try:
+        stalled = poller.submit({"prompt": "stalled"}, 1)
+        while poller.status_checks == 0:
+            threading.Event().wait(0.01)
+        # Submitted while the first job's check is stuck: it must still be polled
+        ready = poller.submit({"prompt": "ready"}, 2)
+        assert ready.result(timeout=2) == "https://videos.example/ready.mp4"
+        assert not stalled.done()
+        release.set()
+        assert stalled.result(timeout=2) == "https://videos.example/stalled.mp4"
+    finally:
+        poller.close()
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+import unicodedata
+import uuid
+from dotenv import load_dotenv
+
+from artifact_store import ArtifactStore
+
+load_dotenv()
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "audio_cache")
+# Byte budget for cached PCM (0 disables the cache)
+TTS_CACHE_BYTES = int(os.getenv("TTS_CACHE_BYTES", str(512 * 1024 ** 2)))
+
+
+def normalize_narration(text: str) -> str:
+    """Canonical form of a narration for hashing: unicode-normalized with collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def segment_key(text: str, voice: str, sample_rate: int) -> str:
+    payload = f"{voice}\0{sample_rate}\0{normalize_narration(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Content-addressed on-disk cache of synthesized PCM, keyed by (narration, voice, sample rate).
+
+    Entries are raw PCM files named by their key. Size is bounded by an
+    ArtifactStore that evicts the least recently used entries.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.store = ArtifactStore([directory], quota_bytes=max_bytes, max_age=0, min_age=60)
+        self._lock = threading.Lock()
+        self._bytes = None  # approximate size on disk, loaded lazily
+        self.hits = 0
+        self.misses = 0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pcm")
+
+    def get(self, text: str, voice: str, sample_rate: int):
+        """Return cached PCM for this narration, or None."""
+        if not self.enabled:
+            return None
+        path = self._path(segment_key(text, voice, sample_rate))
+        try:
+            with open(path, "rb") as f:
+                pcm = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.store.touch(path)
+        self.hits += 1
+        return pcm
+
+    def put(self, text: str, voice: str, sample_rate: int, pcm: bytes):
+        if not self.enabled or not pcm:
+            return
+        path = self._path(segment_key(text, voice, sample_rate))
+        # Write to a temp name and rename so readers never see a partial entry
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(pcm)
+        os.replace(temp_path, path)
+        self.store.touch(path)
+
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self.store.stats()["total_bytes"]
+            else:
+                self._bytes += len(pcm)
+            over_quota = self._bytes > self.max_bytes
+        if over_quota:
+            result = self.store.sweep()
+            with self._lock:
+                self._bytes = result["bytes_after"]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evicted_files": self.store.evicted_files,
+        }
+
+
+tts_cache = TTSCache()
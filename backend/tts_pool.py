@@ -0,0 +1,302 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+import websockets
+from websockets.protocol import State
+from dotenv import load_dotenv
+
+load_dotenv()
+
+XAI_API_KEY = os.getenv("XAI_API_KEY")
+REALTIME_URL = os.getenv("XAI_REALTIME_URL", "wss://api.x.ai/v1/realtime")
+
+# Keep warm realtime connections between utterances (0 opens a fresh socket per call)
+TTS_POOL_ENABLED = os.getenv("TTS_POOL_ENABLED", "1") != "0"
+# Upper bound on open realtime connections per event loop, idle or busy
+TTS_POOL_MAX_CONNECTIONS = int(os.getenv("TTS_POOL_MAX_CONNECTIONS", "8"))
+# Idle sessions older than this are closed instead of reused
+TTS_POOL_IDLE_TIMEOUT = float(os.getenv("TTS_POOL_IDLE_TIMEOUT", "60"))
+# Sessions are recycled after this age or number of utterances to bound server-side conversation state
+TTS_POOL_MAX_AGE = float(os.getenv("TTS_POOL_MAX_AGE", "600"))
+TTS_POOL_MAX_USES = int(os.getenv("TTS_POOL_MAX_USES", "20"))
+# Idle sessions unused for longer than this are pinged before reuse
+TTS_POOL_PING_AFTER = float(os.getenv("TTS_POOL_PING_AFTER", "15"))
+
+SAMPLE_RATE = 24000
+
+
+class TTSSession:
+    """One realtime websocket configured for a voice, reusable for sequential utterances."""
+
+    def __init__(self, ws, voice: str):
+        self.ws = ws
+        self.voice = voice
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        self.healthy = True
+        self._items = set()  # conversation items created by the current utterance
+
+    @classmethod
+    async def connect(cls, voice: str, url: str = REALTIME_URL):
+        ws = await websockets.connect(
+            uri=url,
+            additional_headers={"Authorization": f"Bearer {XAI_API_KEY}"}
+        )
+        # Configure session with desired voice once; later utterances reuse it
+        session_config = {
+            "type": "session.update",
+            "session": {
+                "voice": voice,  # Options: Ara, Rex, Sal, Eve, Leo
+                "instructions": "You are a text-to-speech assistant. Read the text exactly as provided.",
+                "turn_detection": {"type": "server_vad"},
+                "audio": {
+                    "input": {"format": {"type": "audio/pcm", "rate": SAMPLE_RATE}},
+                    "output": {"format": {"type": "audio/pcm", "rate": SAMPLE_RATE}}
+                }
+            }
+        }
+        await ws.send(json.dumps(session_config))
+        return cls(ws, voice)
+
+    @property
+    def is_open(self) -> bool:
+        return self.ws.state is State.OPEN
+
+    def is_reusable(self, now: float) -> bool:
+        return (
+            self.healthy
+            and self.is_open
+            and now - self.created_at < TTS_POOL_MAX_AGE
+            and now - self.last_used < TTS_POOL_IDLE_TIMEOUT
+            and self.uses < TTS_POOL_MAX_USES
+        )
+
+    async def ping(self, timeout: float = 2.0) -> bool:
+        try:
+            pong = await self.ws.ping()
+            await asyncio.wait_for(pong, timeout)
+            return True
+        except Exception:
+            return False
+
+    async def speak(self, text: str, on_audio, done_timeout: float = 5.0) -> bool:
+        """Synthesize text, passing base64 audio deltas to on_audio.
+
+        Returns True if the response completed, False if the server sent an error.
+        """
+        self.uses += 1
+        item_id = f"tts_{uuid.uuid4().hex[:24]}"
+        self._items = {item_id}
+
+        # Send the text to convert
+        text_message = {
+            "type": "conversation.item.create",
+            "item": {
+                "id": item_id,
+                "type": "message",
+                "role": "user",
+                "content": [{"type": "input_text", "text": text}]
+            }
+        }
+        await self.ws.send(json.dumps(text_message))
+
+        # Request response
+        response_request = {
+            "type": "response.create",
+            "response": {
+                "modalities": ["audio"]  # Only audio, no text needed
+            }
+        }
+        await self.ws.send(json.dumps(response_request))
+
+        while True:
+            event = await self._recv()
+
+            if event["type"] == "response.output_audio.delta":
+                on_audio(event["delta"])
+
+            elif event["type"] == "response.output_audio.done":
+                break
+
+            elif event["type"] == "error":
+                print(f"Error: {event}")
+                self.healthy = False
+                return False
+
+        # Drain the rest of this response so its trailing events don't leak into the next utterance
+        try:
+            await asyncio.wait_for(self._drain_until("response.done"), done_timeout)
+            await asyncio.wait_for(self._forget(), done_timeout)
+        except asyncio.TimeoutError:
+            self.healthy = False
+        self.last_used = time.monotonic()
+        return True
+
+    async def _recv(self) -> dict:
+        """Next server event, noting the ids of conversation items it mentions."""
+        event = json.loads(await self.ws.recv())
+        item = event.get("item")
+        if isinstance(item, dict) and item.get("id"):
+            self._items.add(item["id"])
+        if event.get("item_id") and event["type"] != "conversation.item.deleted":
+            self._items.add(event["item_id"])
+        return event
+
+    async def _drain_until(self, event_type: str):
+        while True:
+            event = await self._recv()
+            if event["type"] == event_type:
+                return
+
+    async def _forget(self):
+        """Delete the utterance's conversation items so the next one is not generated with it in context.
+
+        A session whose history could not be cleared is not reused.
+        """
+        if len(self._items) < 2:
+            # The reply's item id was never reported, so it cannot be deleted
+            self.healthy = False
+            return
+        pending = set(self._items)
+        for item_id in pending:
+            await self.ws.send(json.dumps({"type": "conversation.item.delete", "item_id": item_id}))
+        while pending:
+            event = json.loads(await self.ws.recv())
+            if event["type"] == "conversation.item.deleted":
+                pending.discard(event.get("item_id"))
+            elif event["type"] == "error":
+                print(f"⚠️  Could not clear TTS session history: {event}")
+                self.healthy = False
+                return
+
+    async def close(self):
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+
+
+class TTSSessionPool:
+    """Pool of warm realtime TTS sessions per voice, bound to one event loop.
+
+    At most max_connections sockets are open at once; when the cap is reached
+    an idle session of another voice is closed to make room. Idle sessions
+    are recycled when stale and pinged before reuse after a quiet period.
+    """
+
+    def __init__(self, max_connections: int = TTS_POOL_MAX_CONNECTIONS, keep_alive: bool = TTS_POOL_ENABLED,
+                 url: str = REALTIME_URL):
+        self.max_connections = max(1, max_connections)
+        self.keep_alive = keep_alive
+        self.url = url
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self._idle = {}  # voice -> deque of idle sessions, most recently used last
+        self._open = 0
+        self.created = 0
+        self.reused = 0
+        self.recycled = 0
+        self.failed = 0
+
+    async def _checkout(self, voice: str) -> TTSSession:
+        idle = self._idle.setdefault(voice, deque())
+        now = time.monotonic()
+        while idle:
+            session = idle.pop()
+            if session.is_reusable(now) and (now - session.last_used < TTS_POOL_PING_AFTER or await session.ping()):
+                self.reused += 1
+                return session
+            self.recycled += 1
+            await self._discard(session)
+
+        if self._open >= self.max_connections:
+            await self._evict_idle()
+        self._open += 1
+        try:
+            session = await TTSSession.connect(voice, self.url)
+        except BaseException:
+            self._open -= 1
+            raise
+        self.created += 1
+        return session
+
+    async def _evict_idle(self):
+        """Close the least recently used idle session of any voice."""
+        oldest = None
+        for sessions in self._idle.values():
+            if sessions and (oldest is None or sessions[0].last_used < oldest.last_used):
+                oldest = sessions[0]
+        if oldest is not None:
+            self._idle[oldest.voice].popleft()
+            self.recycled += 1
+            await self._discard(oldest)
+
+    async def _discard(self, session: TTSSession):
+        self._open -= 1
+        await session.close()
+
+    @asynccontextmanager
+    async def session(self, voice: str):
+        """Borrow a session for voice; it goes back to the pool if the utterance completed cleanly."""
+        async with self._slots:
+            session = await self._checkout(voice)
+            ok = False
+            try:
+                yield session
+                ok = True
+            finally:
+                if ok and self.keep_alive and session.is_reusable(time.monotonic()):
+                    self._idle[voice].append(session)
+                else:
+                    if not ok:
+                        self.failed += 1
+                    await self._discard(session)
+
+    async def speak(self, text: str, voice: str, on_audio) -> bool:
+        """Synthesize text on a pooled session, retrying once on a fresh socket if a reused one had died.
+
+        Returns True if the utterance completed without a server error.
+        """
+        delivered = False
+
+        def forward(delta):
+            nonlocal delivered
+            delivered = True
+            on_audio(delta)
+
+        for attempt in range(2):
+            try:
+                async with self.session(voice) as session:
+                    return await session.speak(text, forward)
+            except websockets.ConnectionClosed:
+                # Only safe to retry if nothing was emitted yet
+                if delivered or attempt == 1:
+                    raise
+
+    def stats(self) -> dict:
+        return {
+            "open": self._open,
+            "idle": sum(len(sessions) for sessions in self._idle.values()),
+            "max_connections": self.max_connections,
+            "created": self.created,
+            "reused": self.reused,
+            "recycled": self.recycled,
+            "failed": self.failed,
+        }
+
+
+_pools = weakref.WeakKeyDictionary()  # event loop -> pool
+
+
+def get_pool() -> TTSSessionPool:
+    """Return the session pool for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = TTSSessionPool()
+    return pool
@@ -0,0 +1,181 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+from artifact_store import ArtifactStore
+
+load_dotenv()
+
+VIDEO_CACHE_DIR = os.getenv("VIDEO_CACHE_DIR", "video_cache")
+# Rendered clips older than this are regenerated instead of reused (0 keeps them until evicted)
+VIDEO_CACHE_TTL = float(os.getenv("VIDEO_CACHE_TTL", str(24 * 3600)))
+# Byte budget for cached clips (0 disables the cache; in-flight jobs are still shared)
+VIDEO_CACHE_BYTES = int(os.getenv("VIDEO_CACHE_BYTES", str(1024 ** 3)))
+# Rendered clips remembered until their first download adds them to the cache
+MAX_PENDING_CLIPS = 256
+
+
+def clip_key(prompt: str, model: str, duration) -> str:
+    payload = f"{model}\0{duration}\0{prompt}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def local_url(path: str) -> str:
+    return "file://" + os.path.abspath(path)
+
+
+def link_or_copy(src: str, dst: str):
+    """Hard-link src to dst, copying instead when they are on different filesystems."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def completed(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class VideoCache:
+    """Persistent cache of rendered video clips keyed by (prompt, model, duration).
+
+    A freshly rendered clip is handed out as its remote URL; the first caller
+    to download it passes the file to keep(), which adds it to the cache
+    directory, and the clip is handed out as a file:// URL afterwards.
+    Concurrent callers asking for the same key while it is being rendered get
+    the same future instead of submitting their own job. Entries expire after
+    ttl seconds and the directory is kept under max_bytes by evicting the
+    least recently used clips.
+    """
+
+    def __init__(self, directory: str = VIDEO_CACHE_DIR, ttl: float = VIDEO_CACHE_TTL,
+                 max_bytes: int = VIDEO_CACHE_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.store = ArtifactStore([directory], quota_bytes=max_bytes, max_age=ttl, min_age=60)
+        self._inflight = {}  # key -> Future resolving to a clip URL (or None)
+        self._lock = threading.Lock()
+        self._rendered = OrderedDict()  # remote URL of a rendered clip -> key, until keep() stores it
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp4")
+
+    def lookup(self, key: str):
+        """Return the local path of a fresh cached clip, or None."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            return None
+        if self.ttl > 0 and age > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        self.store.touch(path)
+        return path
+
+    def get_or_submit(self, key: str, submit) -> Future:
+        """Return a Future for the clip's URL, submitting at most one job per key across concurrent callers.
+
+        submit() starts the job and returns a Future of the remote URL (or None on failure).
+        """
+        path = self.lookup(key)
+        if path:
+            self.hits += 1
+            print(f"♻️  Reusing cached clip {key[:12]}")
+            return completed(local_url(path))
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                print(f"⏳ Joining in-flight clip {key[:12]}")
+                return future
+            future = self._inflight[key] = Future()
+            self.misses += 1
+
+        try:
+            job = submit()
+        except Exception as e:
+            print(f"❌ Could not submit clip {key[:12]}: {e}")
+            self._complete(key, future, None)
+            return future
+        job.add_done_callback(lambda job: self._on_rendered(key, future, job))
+        return future
+
+    def _on_rendered(self, key: str, future: Future, job: Future):
+        try:
+            url = job.result()
+        except Exception as e:
+            print(f"❌ Clip {key[:12]} failed: {e}")
+            url = None
+        self._complete(key, future, url)
+
+    def _complete(self, key: str, future: Future, url):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if url and self.enabled:
+                self._rendered[url] = key
+                while len(self._rendered) > MAX_PENDING_CLIPS:
+                    self._rendered.popitem(last=False)
+        future.set_result(url)
+
+    def keep(self, url: str, path: str):
+        """Add the clip just downloaded from url to path to the cache, if url is a clip rendered through it."""
+        with self._lock:
+            key = self._rendered.pop(url, None)
+        if key is None:
+            return
+        cache_path = self._path(key)
+        temp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            link_or_copy(path, temp_path)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            print(f"⚠️  Could not cache clip {key[:12]}: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        self.store.touch(cache_path)
+        self.store.sweep()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "in_flight": len(self._inflight),
+            "ttl_seconds": self.ttl,
+            "max_bytes": self.max_bytes,
+            "evicted_files": self.store.evicted_files,
+        }
+
+
+video_cache = VideoCache()
@@ -1,17 +1,36 @@
 import os
+import contextvars
 from dotenv import load_dotenv
 import requests
-import time
 import json
 from script_gen import generate_script
 import subprocess
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
+import queue
+import shutil
+import tempfile
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from video_cache import video_cache, clip_key, link_or_copy
+from video_poller import video_poller
+from hls import remux_to_ts
+from metrics import span
 
 load_dotenv()
 
 XAI_API_KEY = os.getenv("XAI_API_KEY")
+VIDEO_MODEL = "grok-imagine-video-a2"
+
+# Segment clips are downloaded in parallel with large buffers over pooled connections
+VIDEO_DOWNLOAD_WORKERS = int(os.getenv("VIDEO_DOWNLOAD_WORKERS", "4"))
+VIDEO_DOWNLOAD_CHUNK_BYTES = int(os.getenv("VIDEO_DOWNLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# Each combine gets its own scratch directory under here (point it at tmpfs, e.g. /dev/shm/briefly, to skip the disk)
+VIDEO_SCRATCH_DIR = os.getenv("VIDEO_SCRATCH_DIR", "temp_videos")
+
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_maxsize=max(10, VIDEO_DOWNLOAD_WORKERS)))
 
 # REFER TO THESE DOCS THAT XAI TEAM SENT
 # curl -X POST 'https://api.x.ai/v1/videos/generations' \
@@ -55,75 +74,42 @@ def build_video_prompt_for_segment(segment: dict, segment_number: int) -> str:
     return "\n".join(lines)
 
 
+def start_video(segment: dict, segment_number: int, max_duration: int = 15):
+    """Start generating the video for one segment; returns a Future of its URL (None on failure)
+
+    Identical (prompt, model, duration) requests are served from the video
+    cache, or share the job already rendering them. Polling happens on the
+    shared job poller, so no thread waits on the job.
+    """
+    duration = segment["end_sec"] - segment["start_sec"]
+    
+    # Cap at max_duration
+    if duration > max_duration:
+        print(f"⚠️  Segment {segment_number} is {duration}s (max is {max_duration}s), capping to {max_duration}s")
+        duration = max_duration
+    
+    prompt = build_video_prompt_for_segment(segment, segment_number)
+    
+    payload = {
+        "prompt": prompt,
+        "model": VIDEO_MODEL,
+        "duration": duration
+    }
+
+    print(f"\n{'='*60}")
+    print(f"🎬 Generating video for Segment {segment_number}")
+    print(f"   Duration: {duration}s")
+    print(f"   Narration: {segment['narration'][:60]}...")
+    print(f"{'='*60}")
+
+    key = clip_key(prompt, VIDEO_MODEL, duration)
+    return video_cache.get_or_submit(key, lambda: video_poller.submit(payload, segment_number))
+
+
 def generate_single_video(segment: dict, segment_number: int, max_duration: int = 15):
     """Generate a single video for one segment"""
     try:
-        duration = segment["end_sec"] - segment["start_sec"]
-        
-        # Cap at max_duration
-        if duration > max_duration:
-            print(f"⚠️  Segment {segment_number} is {duration}s (max is {max_duration}s), capping to {max_duration}s")
-            duration = max_duration
-        
-        # Initial request to generate video
-        url = "https://api.x.ai/v1/videos/generations"
-        prompt = build_video_prompt_for_segment(segment, segment_number)
-        
-        payload = {
-            "prompt": prompt,
-            "model": "grok-imagine-video-a2",
-            "duration": duration
-        }
-
-        headers = {
-            "Authorization": f"Bearer {XAI_API_KEY}",
-            "Content-Type": "application/json",
-        }
-
-        print(f"\n{'='*60}")
-        print(f"🎬 Generating video for Segment {segment_number}")
-        print(f"   Duration: {duration}s")
-        print(f"   Narration: {segment['narration'][:60]}...")
-        print(f"{'='*60}")
-
-        response = requests.post(url, json=payload, headers=headers)
-        request_id = response.json()["request_id"]
-        
-        print(f"✓ Request ID: {request_id}")
-
-        # Poll for status
-        status_url = f"https://api.x.ai/v1/videos/{request_id}"
-        
-        max_wait_time = 180  # 3 minutes
-        start_time = time.time()
-
-        while True:
-            if time.time() - start_time > max_wait_time:
-                print(f"❌ Timeout: Video generation took too long")
-                return None
-            
-            response = requests.get(status_url, headers=headers)
-            data = response.json()
-            status = data.get("status")
-            
-            print(f"   Status: {status if status else 'completed'}")
-            
-            if status is None:  # Video is ready
-                video_url = data.get("video", {}).get("url")
-                print(f"\n✅ Video {segment_number} ready!")
-                print(f"🔗 URL: {video_url}\n")
-                return video_url
-            elif status == "failed":
-                error_msg = data.get("error", "Unknown error")
-                print(f"❌ Video generation failed: {error_msg}")
-                return None
-            elif status == "pending":
-                print("   Still processing... checking again in 2 seconds")
-                time.sleep(2)
-            else:
-                print(f"⚠️  Unknown status: {status}")
-                return None
-                
+        return start_video(segment, segment_number, max_duration).result()
     except Exception as e:
         print(f"❌ Error generating video {segment_number}: {e}")
         import traceback
@@ -131,26 +117,31 @@ def generate_single_video(segment: dict, segment_number: int, max_duration: int
         return None
 
 
-def generate_videos(script_segments, max_workers: int = 5):
-    """Generate videos for all segments in parallel"""
-    video_urls = [None] * len(script_segments)  # Pre-allocate list
-    
-    print(f"\n🎥 Starting parallel video generation for {len(script_segments)} segments")
-    print(f"   Max concurrent workers: {max_workers}")
+def generate_videos(script_segments):
+    """Generate videos for all segments concurrently
+
+    script_segments may be any iterable (e.g. a streamed script); each
+    segment is submitted as soon as it is yielded.
+    """
+    print(f"\n🎥 Starting parallel video generation")
     print(f"{'='*60}\n")
     
-    # Thread-safe printing
-    print_lock = threading.Lock()
+    # Submit every segment as it arrives; the poller tracks them all from one event loop
+    futures = {}
+    script_segments = list(_submitted(script_segments, futures))
+    video_urls = [None] * len(script_segments)  # Pre-allocate list
     
-    def generate_with_index(index_and_segment):
-        """Wrapper to track segment index"""
-        i, segment = index_and_segment
+    # Collect results as they complete
+    completed = 0
+    for future in as_completed(futures):
+        i = futures[future]
+        segment = script_segments[i]
         segment_number = i + 1
+        completed += 1
         
-        video_url = generate_single_video(segment, segment_number)
-        
+        video_url = future.result()
         if video_url:
-            return i, {
+            video_urls[i] = {
                 "segment": segment_number,
                 "url": video_url,
                 "start_sec": segment["start_sec"],
@@ -158,32 +149,9 @@ def generate_videos(script_segments, max_workers: int = 5):
                 "narration": segment["narration"]
             }
         else:
-            with print_lock:
-                print(f"⚠️  Segment {segment_number} failed\n")
-            return i, None
-    
-    # Generate all videos in parallel
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks
-        futures = {
-            executor.submit(generate_with_index, (i, segment)): i 
-            for i, segment in enumerate(script_segments)
-        }
+            print(f"⚠️  Segment {segment_number} failed\n")
         
-        # Collect results as they complete
-        completed = 0
-        for future in as_completed(futures):
-            try:
-                index, result = future.result()
-                video_urls[index] = result
-                completed += 1
-                
-                with print_lock:
-                    print(f"📊 Progress: {completed}/{len(script_segments)} videos completed\n")
-                    
-            except Exception as e:
-                with print_lock:
-                    print(f"❌ Error in parallel generation: {e}\n")
+        print(f"📊 Progress: {completed}/{len(script_segments)} videos completed\n")
     
     print(f"\n{'='*60}")
     print(f"✅ Generation complete!")
@@ -201,17 +169,79 @@ def generate_videos(script_segments, max_workers: int = 5):
     
     return video_urls
 
+def _submitted(script_segments, futures: dict, max_duration: int = 15, on_started=None, on_failed=None):
+    """Yield each segment after starting its video; futures maps each start_video Future to its index"""
+    for i, segment in enumerate(script_segments):
+        try:
+            future = start_video(segment, i + 1, max_duration)
+            futures[future] = i
+            if on_started:
+                on_started(future)
+        except Exception as e:
+            print(f"❌ Error starting video {i + 1}: {e}")
+            if on_failed:
+                on_failed(i)
+        yield segment
+
+
 def download_video(url: str, output_path: str):
-    """Download a video from URL to local file"""
+    """Download a video from URL to local file and add it to the video cache
+
+    file:// URLs from the video cache are linked (or copied) instead.
+    """
+    if url.startswith("file://"):
+        link_or_copy(url[len("file://"):], output_path)
+        print(f"  ✓ Linked from cache: {output_path}")
+        return
+
     print(f"  Downloading: {output_path}")
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
-    
-    with open(output_path, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
+    with span("video_download") as download, http_session.get(url, stream=True, timeout=(10, 60)) as response:
+        response.raise_for_status()
+        
+        download["bytes"] = 0
+        with open(output_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=VIDEO_DOWNLOAD_CHUNK_BYTES):
+                f.write(chunk)
+                download["bytes"] += len(chunk)
     
     print(f"  ✓ Downloaded: {output_path}")
+    video_cache.keep(url, output_path)
+
+
+@contextmanager
+def job_workspace():
+    """Private scratch directory for one combine, removed on every exit path."""
+    os.makedirs(VIDEO_SCRATCH_DIR, exist_ok=True)
+    temp_dir = Path(tempfile.mkdtemp(prefix="job_", dir=VIDEO_SCRATCH_DIR))
+    try:
+        yield temp_dir
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def publish_file(src: str, dst: str):
+    """Move src to dst atomically, copying through a temp name when they are on different filesystems."""
+    try:
+        os.replace(src, dst)
+    except OSError:
+        temp_path = f"{dst}.{os.getpid()}.{os.path.basename(os.path.dirname(src))}.tmp"
+        try:
+            shutil.copyfile(src, temp_path)
+            os.replace(temp_path, dst)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def fetch_segment(url: str, temp_dir: Path, segment_number: int):
+    """Download one segment clip into temp_dir. Returns its path, or None on failure."""
+    try:
+        filepath = temp_dir / f"segment_{segment_number:02d}.mp4"
+        download_video(url, str(filepath))
+        return str(filepath)
+    except Exception as e:
+        print(f"❌ Failed to download segment {segment_number}: {e}")
+        return None
 
 
 def combine_videos(video_urls: list, output_filename: str = "final_video.mp4"):
@@ -228,22 +258,105 @@ def combine_videos(video_urls: list, output_filename: str = "final_video.mp4"):
     print(f"🎬 Combining {len(valid_videos)} videos")
     print(f"{'='*60}\n")
     
-    # Create temp directory for downloads
-    temp_dir = Path("temp_videos")
-    temp_dir.mkdir(exist_ok=True)
-    
-    # Download all videos
-    downloaded_files = []
-    for i, video in enumerate(valid_videos, start=1):
+    # Download all videos in parallel into this job's own scratch directory
+    with job_workspace() as temp_dir:
+        with ThreadPoolExecutor(max_workers=VIDEO_DOWNLOAD_WORKERS) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, fetch_segment, video["url"], temp_dir, i)
+                for i, video in enumerate(valid_videos, start=1)
+            ]
+            downloaded_files = [f.result() for f in futures]
+        
+        with span("ffmpeg_concat"):
+            return concat_videos([f for f in downloaded_files if f], temp_dir, output_filename)
+
+
+def publish_segment(playlist, index: int, filepath, duration: float):
+    """Remux a downloaded clip into the HLS playlist, or skip it if it failed."""
+    if filepath:
         try:
-            filename = f"segment_{i:02d}.mp4"
-            filepath = temp_dir / filename
-            download_video(video["url"], str(filepath))
-            downloaded_files.append(str(filepath))
+            with span("hls_remux"):
+                remux_to_ts(filepath, playlist.segment_path(index))
+            playlist.add(index, duration)
+            return
         except Exception as e:
-            print(f"❌ Failed to download segment {i}: {e}")
-            continue
+            print(f"⚠️  Could not add segment {index + 1} to the playlist: {e}")
+    playlist.skip(index)
+
+
+def generate_and_combine_videos(script_segments, output_filename: str = "final_video.mp4", on_generated=None,
+                                playlist=None, max_duration: int = 15):
+    """Generate all segment videos and combine them, downloading each clip as soon as it is ready
+
+    script_segments may be any iterable; each segment's generation starts as
+    soon as it is yielded, so a streamed script feeds the video API while it
+    is still being written. Downloads overlap the generations still in
+    progress, so once the last clip lands only the ffmpeg concat is left.
+    on_generated() is called when every generation has finished. If an
+    HLSPlaylist is given, each clip is also appended to it (in order) as soon
+    as it and every earlier clip is ready, so playback can start long before
+    the concat.
+    """
+    print(f"\n🎥 Generating and combining segments")
+    
+    with job_workspace() as temp_dir:
+        segments = []
+        futures = {}
+        rendered = queue.Queue()
+    
+        def download(url, i):
+            filepath = fetch_segment(url, temp_dir, i + 1)
+            if playlist:
+                segment = segments[i]
+                publish_segment(playlist, i, filepath, min(segment["end_sec"] - segment["start_sec"], max_duration))
+            return filepath
     
+        def collect(block: bool):
+            """Start the download of every clip that has finished rendering"""
+            while True:
+                try:
+                    future = rendered.get(block=block)
+                except queue.Empty:
+                    return
+                i = futures.pop(future)
+                video_url = future.result()
+                if video_url:
+                    # Pool threads don't inherit contextvars; copy them so downloads land in the briefing's trace
+                    downloads[i] = pool.submit(contextvars.copy_context().run, download, video_url, i)
+                else:
+                    print(f"⚠️  Segment {i + 1} failed\n")
+                    if playlist:
+                        playlist.skip(i)
+                if block and not futures:
+                    return
+    
+        downloads = {}
+        with ThreadPoolExecutor(max_workers=VIDEO_DOWNLOAD_WORKERS) as pool:
+            submitted = _submitted(script_segments, futures, max_duration,
+                                   on_started=lambda future: future.add_done_callback(rendered.put),
+                                   on_failed=playlist.skip if playlist else None)
+            for segment in submitted:
+                segments.append(segment)
+                collect(block=False)
+            print(f"🎬 All {len(segments)} segment videos submitted")
+            if futures:
+                collect(block=True)
+            if on_generated:
+                on_generated()
+        if playlist:
+            playlist.finish(len(segments))
+    
+        downloaded_files = [downloads[i].result() for i in sorted(downloads)]
+        with span("ffmpeg_concat"):
+            return concat_videos([f for f in downloaded_files if f], temp_dir, output_filename)
+
+
+def concat_videos(downloaded_files: list, temp_dir: Path, output_filename: str):
+    """Concatenate downloaded clips (in order) into videos/output_filename with ffmpeg
+
+    The output is built inside temp_dir and moved into videos/ only once it
+    is complete, so a half-written file is never served.
+    """
     if not downloaded_files:
         print("❌ No videos were downloaded successfully")
         return None
@@ -261,8 +374,8 @@ def combine_videos(video_urls: list, output_filename: str = "final_video.mp4"):
     output_path = str(Path("videos") / output_filename)
     Path("videos").mkdir(exist_ok=True)
     
-    # Get absolute path for output
-    abs_output_path = str(Path(output_path).absolute())
+    # Build the combined file in the job's scratch directory first
+    combined_name = f"combined_{output_filename}"
     
     try:
         # Use ffmpeg concat demuxer (fastest, no re-encoding)
@@ -273,18 +386,13 @@ def combine_videos(video_urls: list, output_filename: str = "final_video.mp4"):
             '-i', 'concat_list.txt',  # ✅ Just filename, not full path
             '-c', 'copy',  # Copy without re-encoding (fast)
             '-y',  # Overwrite output file
-            abs_output_path  # ✅ Use absolute path for output
+            combined_name
         ], check=True, cwd=str(temp_dir), capture_output=True, text=True)
         
+        publish_file(str(temp_dir / combined_name), output_path)
         print(f"\n✅ Video combined successfully!")
         print(f"📁 Output: {output_path}\n")
         
-        # Clean up temp files
-        print("🧹 Cleaning up temporary files...")
-        for filepath in downloaded_files:
-            os.remove(filepath)
-        os.remove(concat_file)
-        
         return output_path
         
     except subprocess.CalledProcessError as e:
@@ -301,17 +409,13 @@ def combine_videos(video_urls: list, output_filename: str = "final_video.mp4"):
                 '-c:v', 'libx264',  # Re-encode video
                 '-c:a', 'aac',      # Re-encode audio
                 '-y',
-                abs_output_path  # ✅ Use absolute path
+                combined_name
             ], check=True, cwd=str(temp_dir), capture_output=True, text=True)
             
+            publish_file(str(temp_dir / combined_name), output_path)
             print(f"\n✅ Video combined successfully (with re-encoding)!")
             print(f"📁 Output: {output_path}\n")
             
-            # Clean up
-            for filepath in downloaded_files:
-                os.remove(filepath)
-            os.remove(concat_file)
-            
             return output_path
             
         except subprocess.CalledProcessError as e2:
@@ -327,8 +431,8 @@ def combine_videos(video_urls: list, output_filename: str = "final_video.mp4"):
 #     script = generate_script(data)
 #     print(f"✓ Script generated with {len(script)} segments\n")
     
-#     # Generate videos in parallel (5 at a time)
-#     video_urls = generate_videos(script, max_workers=10)
+#     # Generate videos in parallel
+#     video_urls = generate_videos(script)
     
 #     # Combine all videos
 #     final_video = combine_videos(video_urls, output_filename="news_briefing_final.mp4")
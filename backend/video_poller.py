@@ -0,0 +1,203 @@
+import asyncio
+import os
+import random
+import threading
+import httpx
+from dotenv import load_dotenv
+
+from scheduler import api_scheduler, current_owner, current_priority, BATCH
+from metrics import span, record, VIDEO_STATUS_CHECKS
+
+load_dotenv()
+
+XAI_API_KEY = os.getenv("XAI_API_KEY")
+VIDEO_API_URL = os.getenv("XAI_VIDEO_API_URL", "https://api.x.ai/v1")
+
+# First status check happens this long after submission; the interval then grows by VIDEO_POLL_BACKOFF
+VIDEO_POLL_INITIAL = float(os.getenv("VIDEO_POLL_INITIAL", "2"))
+VIDEO_POLL_MAX = float(os.getenv("VIDEO_POLL_MAX", "10"))
+VIDEO_POLL_BACKOFF = float(os.getenv("VIDEO_POLL_BACKOFF", "1.5"))
+# Each interval is randomized by +/- this fraction so jobs submitted together don't poll in lockstep
+VIDEO_POLL_JITTER = float(os.getenv("VIDEO_POLL_JITTER", "0.2"))
+VIDEO_JOB_TIMEOUT = float(os.getenv("VIDEO_JOB_TIMEOUT", "180"))
+# Connections shared by every submission and status check
+VIDEO_HTTP_CONNECTIONS = int(os.getenv("VIDEO_HTTP_CONNECTIONS", "8"))
+
+
+class VideoJob:
+    def __init__(self, request_id: str, segment_number: int, future: asyncio.Future, now: float,
+                 owner=None, priority: int = BATCH):
+        self.request_id = request_id
+        self.segment_number = segment_number
+        self.future = future
+        # Status checks run from the poll loop, so they carry the submitter's scheduling identity
+        self.owner = owner
+        self.priority = priority
+        self.submitted_at = now
+        self.deadline = now + VIDEO_JOB_TIMEOUT
+        self.interval = VIDEO_POLL_INITIAL
+        self.next_check = now + jittered(self.interval)
+        self.checks = 0
+        self.checking = False
+
+
+def jittered(interval: float) -> float:
+    return interval * random.uniform(1 - VIDEO_POLL_JITTER, 1 + VIDEO_POLL_JITTER)
+
+
+class VideoJobPoller:
+    """Tracks every outstanding video generation job from one background event loop.
+
+    Jobs are submitted and polled over a single pooled HTTP client. One poll
+    loop sleeps until the earliest job is due and starts a check task for
+    every due job, so a check waiting for a scheduler slot never holds up the
+    others; each job backs off exponentially (with jitter) while it is pending.
+    Callers get a concurrent.futures.Future that resolves to the video URL,
+    or None if the job failed or timed out, so waiting costs no thread.
+    """
+
+    def __init__(self, api_url: str = VIDEO_API_URL, max_connections: int = VIDEO_HTTP_CONNECTIONS):
+        self.api_url = api_url
+        self.max_connections = max_connections
+        self._jobs = {}  # request_id -> VideoJob
+        self._loop = None
+        self._client = None
+        self._wakeup = None
+        self._checks = set()  # running check tasks
+        self._start_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.status_checks = 0
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="video-poller", daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+            self._loop = loop
+
+    async def _setup(self):
+        self._client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {XAI_API_KEY}"},
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+        )
+        self._wakeup = asyncio.Event()
+        asyncio.get_running_loop().create_task(self._poll_loop())
+
+    def submit(self, payload: dict, segment_number: int):
+        """Start a generation job; returns a concurrent.futures.Future for its video URL."""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._run_job(payload, segment_number), self._loop)
+
+    async def _run_job(self, payload: dict, segment_number: int):
+        async with api_scheduler.aslot("video"):
+            with span("video_submit"):
+                response = await self._client.post(f"{self.api_url}/videos/generations", json=payload)
+        request_id = response.json()["request_id"]
+        print(f"✓ Request ID: {request_id} (segment {segment_number})")
+        self.submitted += 1
+
+        loop = asyncio.get_running_loop()
+        job = VideoJob(request_id, segment_number, loop.create_future(), loop.time(),
+                       owner=current_owner.get(), priority=current_priority.get())
+        self._jobs[request_id] = job
+        self._wakeup.set()
+        try:
+            video_url = await job.future
+        finally:
+            self._jobs.pop(request_id, None)
+        # Submission to resolution, i.e. rendering time as seen through the poll backoff
+        record("video_wait", loop.time() - job.submitted_at, segment=segment_number, polls=job.checks,
+               ok=bool(video_url))
+        VIDEO_STATUS_CHECKS.observe(job.checks)
+        return video_url
+
+    async def _poll_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            now = loop.time()
+            waiting = [job for job in self._jobs.values() if not job.checking and not job.future.done()]
+            for job in waiting:
+                if job.next_check <= now:
+                    job.checking = True
+                    task = loop.create_task(self._run_check(job))
+                    self._checks.add(task)
+                    task.add_done_callback(self._checks.discard)
+            pending = [job.next_check for job in waiting if not job.checking]
+            try:
+                # Sleep until the next job is due, a new job arrives or a check finishes
+                await asyncio.wait_for(self._wakeup.wait(), min(pending) - now if pending else None)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_check(self, job: VideoJob):
+        try:
+            await self._check(job)
+        finally:
+            job.checking = False
+            # Let the loop schedule the job's next check
+            self._wakeup.set()
+
+    async def _check(self, job: VideoJob):
+        loop = asyncio.get_running_loop()
+        if loop.time() > job.deadline:
+            print(f"❌ Timeout: Video {job.segment_number} generation took too long")
+            self._resolve(job, None)
+            return
+
+        self.status_checks += 1
+        job.checks += 1
+        try:
+            async with api_scheduler.aslot("video", owner=job.owner, priority=job.priority):
+                response = await self._client.get(f"{self.api_url}/videos/{job.request_id}")
+            data = response.json()
+        except Exception as e:
+            print(f"⚠️  Status check for video {job.segment_number} failed: {e}")
+            self._reschedule(job, loop.time())
+            return
+
+        status = data.get("status")
+        if status is None:  # Video is ready
+            video_url = data.get("video", {}).get("url")
+            print(f"\n✅ Video {job.segment_number} ready after {job.checks} checks!")
+            print(f"🔗 URL: {video_url}\n")
+            self._resolve(job, video_url)
+        elif status == "failed":
+            print(f"❌ Video generation failed: {data.get('error', 'Unknown error')}")
+            self._resolve(job, None)
+        elif status == "pending":
+            self._reschedule(job, loop.time())
+        else:
+            print(f"⚠️  Unknown status: {status}")
+            self._resolve(job, None)
+
+    def _reschedule(self, job: VideoJob, now: float):
+        job.interval = min(job.interval * VIDEO_POLL_BACKOFF, VIDEO_POLL_MAX)
+        job.next_check = now + jittered(job.interval)
+
+    def _resolve(self, job: VideoJob, video_url):
+        if video_url:
+            self.completed += 1
+        else:
+            self.failed += 1
+        if not job.future.done():
+            job.future.set_result(video_url)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._jobs),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "status_checks": self.status_checks,
+            "max_connections": self.max_connections,
+        }
+
+
+video_poller = VideoJobPoller()
@@ -0,0 +1,121 @@
+"""Briefing worker: claims queued jobs from the shared job store and runs the pipeline.
+
+Start the API with JOB_EXECUTION=workers and run as many of these as the
+host (or hosts sharing the job database and artifact directories) can take:
+
+    cd backend
+    python worker.py --concurrency 2
+
+Pipeline spans are recorded in the worker, so each worker can serve its own
+Prometheus metrics with --metrics-port (one port per worker).
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+import metrics
+from job_store import job_store
+
+load_dotenv()
+
+# Briefings one worker process runs at the same time
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+# How long an idle worker waits before looking for queued jobs again
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "0.25"))
+# Serve this worker's /metrics on this port (0 disables it)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", metrics.CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int):
+    """Expose GET /metrics on port from a background thread."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📊 Metrics on http://0.0.0.0:{port}/metrics")
+
+
+def run_job(job: dict, pipeline, store=job_store):
+    """Run one claimed job, appending every event to the store."""
+    job_id = job["jobId"]
+    try:
+        for event in pipeline(**job["params"], priority=job["priority"]):
+            store.append(job_id, event)
+    except Exception as e:
+        traceback.print_exc()
+        store.append(job_id, {"type": "error", "message": str(e)})
+    finally:
+        store.finish(job_id)
+
+
+def serve(concurrency: int = WORKER_CONCURRENCY, pipeline=None, store=job_store, stop: threading.Event = None,
+          poll_interval: float = WORKER_POLL_INTERVAL):
+    """Claim and run jobs until stop is set, at most concurrency at a time."""
+    if pipeline is None:
+        from briefing_gen import run_briefing, bind_event_loop
+
+        # Audio generation runs its coroutines on this loop, so the TTS session pool stays warm across jobs
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="worker-loop", daemon=True).start()
+        bind_event_loop(loop)
+        pipeline = run_briefing
+
+    stop = stop or threading.Event()
+    slots = threading.Semaphore(concurrency)
+    print(f"👷 Worker {store.worker_id} ready ({concurrency} concurrent jobs)")
+
+    def run_and_release(job):
+        try:
+            run_job(job, pipeline, store)
+        finally:
+            slots.release()
+
+    last_recover = 0.0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job") as pool:
+        while not stop.is_set():
+            slots.acquire()
+            job = store.claim()
+            if job is None:
+                slots.release()
+                if time.time() - last_recover > store.lease:
+                    # Some worker has to notice jobs whose process died
+                    store.recover()
+                    last_recover = time.time()
+                stop.wait(poll_interval)
+                continue
+            print(f"📥 Claimed job {job['jobId']}")
+            pool.submit(run_and_release, job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    parser.add_argument("--metrics-port", type=int, default=WORKER_METRICS_PORT)
+    args = parser.parse_args()
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    serve(args.concurrency)
+
+
+if __name__ == "__main__":
+    main()